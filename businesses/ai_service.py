@@ -1,19 +1,129 @@
 import openai
+import httpx
 from django.conf import settings
+import asyncio
 import logging
 import random
 import re
 import json
 import os
+import threading
+import weakref
+
+from businesses.circuit_breaker import CircuitBreaker
+from businesses.metrics import OPENAI_TOKENS, count_fallback, time_stage
+
 logger = logging.getLogger(__name__)
 
+# Shared OpenAI clients, one per worker process (and one per event loop for
+# the async client), so connections are reused instead of re-doing DNS, TCP
+# and TLS on every review.
+_openai_client = None
+_async_openai_clients = weakref.WeakKeyDictionary()
+_client_lock = threading.Lock()
+
+def _openai_client_options():
+    return {
+        "api_key": settings.OPENAI_API_KEY,
+        "base_url": settings.OPENAI_BASE_URL,
+        "timeout": httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT),
+        "max_retries": settings.OPENAI_MAX_RETRIES,
+    }
+
+def _openai_pool_limits():
+    return httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+def get_openai_client():
+    """Return the process-wide OpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        with _client_lock:
+            if _openai_client is None:
+                _openai_client = openai.OpenAI(
+                    **_openai_client_options(),
+                    http_client=openai.DefaultHttpxClient(limits=_openai_pool_limits()),
+                )
+    return _openai_client
+
+def get_async_openai_client():
+    """Return the AsyncOpenAI client bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_openai_clients.get(loop)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            **_openai_client_options(),
+            http_client=openai.DefaultAsyncHttpxClient(limits=_openai_pool_limits()),
+        )
+        _async_openai_clients[loop] = client
+    return client
+
+def _warm_up_options(client):
+    # Same connection pool, but don't let a slow API hold up worker boot
+    return client.with_options(timeout=settings.OPENAI_CONNECT_TIMEOUT, max_retries=0)
+
+def warm_up_openai_client():
+    """
+    Open a pooled connection to OpenAI in the background at worker boot so
+    the first review after a deploy doesn't pay for the TLS handshake.
+    """
+    if not settings.OPENAI_WARMUP or not settings.OPENAI_API_KEY:
+        return
+
+    def warm_up():
+        try:
+            _warm_up_options(get_openai_client()).models.list()
+            logger.info("OpenAI client warmed up")
+        except Exception as e:
+            logger.warning(f"OpenAI warm-up failed: {e}")
+
+    threading.Thread(target=warm_up, name="openai-warmup", daemon=True).start()
+
+async def awarm_up_openai_client():
+    """Async version of warm_up_openai_client for the running event loop."""
+    if not settings.OPENAI_WARMUP or not settings.OPENAI_API_KEY:
+        return
+    try:
+        await _warm_up_options(get_async_openai_client()).models.list()
+        logger.info("Async OpenAI client warmed up")
+    except Exception as e:
+        logger.warning(f"OpenAI warm-up failed: {e}")
+
 # Load reviews once at module level
 REVIEWS_PATH = os.path.join(settings.BASE_DIR, 'businesses', 'data', 'restaurant_reviews.json')
 REVIEW_DATASET = None
+REVIEW_INDEX = None
+RATINGS = range(1, 6)
+
+def build_review_index(reviews):
+    """
+    Bucket reviews by star rating so sampling never has to rescan the dataset.
+
+    Args:
+        reviews (list): review dicts with a 'stars' key
+
+    Returns:
+        dict: rating (1-5) -> (exact matches, reviews within ±1 star)
+    """
+    by_stars = {}
+    for review in reviews:
+        by_stars.setdefault(review.get('stars', 0), []).append(review)
+
+    index = {}
+    for rating in RATINGS:
+        nearby = []
+        for stars, bucket in by_stars.items():
+            if abs(stars - rating) <= 1:
+                nearby.extend(bucket)
+        index[rating] = by_stars.get(rating, []), nearby
+    return index
 
 def load_review_dataset():
-    """Load the review dataset once."""
-    global REVIEW_DATASET
+    """Load the review dataset once and build its per-rating index."""
+    global REVIEW_DATASET, REVIEW_INDEX
     if REVIEW_DATASET is None:
         try:
             with open(REVIEWS_PATH, 'r', encoding='utf-8') as f:
@@ -22,6 +132,8 @@ def load_review_dataset():
         except Exception as e:
             logger.error(f"Failed to load review dataset: {e}")
             REVIEW_DATASET = []
+    if REVIEW_INDEX is None:
+        REVIEW_INDEX = build_review_index(REVIEW_DATASET)
     return REVIEW_DATASET
 
 def get_example_reviews(rating, num_examples=3):
@@ -31,12 +143,14 @@ def get_example_reviews(rating, num_examples=3):
     if not reviews:
         return []
     
-    exact_matches = [r for r in reviews if r.get('stars') == rating]
+    # The index only has 1-5; ratings come from the form, so clamp instead of trusting them
+    rating = min(max(round(rating), RATINGS[0]), RATINGS[-1])
+    exact_matches, nearby = REVIEW_INDEX[rating]
     
     if len(exact_matches) >= num_examples:
         matching = exact_matches
     else:
-        matching = [r for r in reviews if abs(r.get('stars', 0) - rating) <= 1]
+        matching = nearby
     
     if not matching:
         return []
@@ -44,6 +158,50 @@ def get_example_reviews(rating, num_examples=3):
     return random.sample(matching, min(num_examples, len(matching)))
 
 
+def average_rating(ratings):
+    """Star rating (1-5) for the review, from the per-category ratings."""
+    return round(sum(ratings.values()) / len(ratings))
+
+
+def is_minimal_feedback(feedback):
+    """True when the customer said too little for the review to be about anything specific."""
+    return not feedback or len(feedback.strip()) < 10
+
+
+# One breaker per worker process, shared by every review request
+OPENAI_BREAKER = CircuitBreaker(
+    "OpenAI",
+    failure_rate=settings.OPENAI_BREAKER_FAILURE_RATE,
+    window=settings.OPENAI_BREAKER_WINDOW,
+    min_calls=settings.OPENAI_BREAKER_MIN_CALLS,
+    slow_call_seconds=settings.OPENAI_BREAKER_SLOW_CALL,
+    open_seconds=settings.OPENAI_BREAKER_OPEN_SECONDS,
+)
+
+
+def _chunk_deltas(chunk):
+    """
+    (choice index, text) for each draft one streamed chunk adds to,
+    recording token usage if the chunk carries it.
+    """
+    if chunk.usage:
+        record_prompt_usage(chunk.usage)
+    return [(choice.index, choice.delta.content) for choice in chunk.choices if choice.delta.content]
+
+
+def _humanize_drafts(texts, avg_rating):
+    """
+    Humanize every completion of one request, dropping empty ones.
+
+    Raises:
+        ValueError: none of the completions had any text
+    """
+    drafts = [humanize(text.strip(), avg_rating) for text in texts if text and text.strip()]
+    if not drafts:
+        raise ValueError("OpenAI API returned empty content")
+    return drafts
+
+
 # 1
 def generate_review_with_ai(ratings, feedback, business_name, tags=""):
     """
@@ -59,101 +217,162 @@ def generate_review_with_ai(ratings, feedback, business_name, tags=""):
     Returns:
         tuple: (ai_review, generation_method, avg_rating)
     """
+    drafts, generation_method, avg_rating = generate_review_drafts(ratings, feedback, business_name, tags)
+    return drafts[0], generation_method, avg_rating
+
+
+def generate_review_drafts(ratings, feedback, business_name, tags="", count=1):
+    """
+    Generate up to `count` alternative reviews with a single OpenAI call
+    (the `n` parameter). The prompt is sent and billed once; only the
+    completions are paid per draft.
+
+    Returns:
+        tuple: (drafts, generation_method, avg_rating); drafts is a non-empty
+        list of humanized reviews, a single template when falling back
+    """
     if not ratings:
         logger.error("Empty ratings dictionary provided")
-        return generate_fallback_review(3, feedback, business_name, tags), "Fallback", 3
+        return [generate_fallback_review(3, feedback, business_name, tags)], "Fallback", 3
 
-    avg_rating = round(sum(ratings.values()) / len(ratings))
+    avg_rating = average_rating(ratings)
 
     try:
-        client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-
-        # Randomize personality and target length
-        personality = random.choice([
-            "busy professional - quick and blunt",
-            "college student - casual with some slang",
-            "foodie - focuses on taste and quality",
-            "regular customer - relaxed and familiar",
-            "first-timer - excited or disappointed"
-        ])
-        
-        length_config = random.choice([
-            {"words": "15-25", "tokens": 40},
-            {"words": "30-45", "tokens": 70},
-            {"words": "50-70", "tokens": 100}
-        ])
-
-        prompt = create_review_prompt(
-            avg_rating, feedback, business_name, tags, personality, length_config["words"]
-        )
+        client = get_openai_client()
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system",
-                 "content": "You write quick, casual Google reviews. Be brief, imperfect, and natural. Avoid AI clichés."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=int(length_config["tokens"]),
-            temperature=0.92,
-            presence_penalty=0.6,
-            frequency_penalty=0.7,
-            top_p=0.95
-        )
+        with time_stage("prompt"):
+            request = build_review_request(avg_rating, feedback, business_name, tags, count)
+        with OPENAI_BREAKER.guard(), time_stage("openai"):
+            response = client.chat.completions.create(**request)
 
-        content = response.choices[0].message.content
-        if not content:
-            raise ValueError("OpenAI API returned empty content")
+        record_prompt_usage(response.usage)
 
-        ai_review = content.strip()
-        
         # Apply humanization post-processing
-        ai_review = humanize(ai_review, avg_rating)
-        
-        logger.info(f"AI review generated ({len(ai_review.split())} words)")
-        return ai_review, "ChatGPT API", avg_rating
+        with time_stage("humanize"):
+            drafts = _humanize_drafts([choice.message.content for choice in response.choices], avg_rating)
+
+        logger.info(f"AI review generated ({len(drafts)} drafts, {len(drafts[0].split())} words)")
+        return drafts, "ChatGPT API", avg_rating
 
     except Exception as e:
         logger.error(f"Error generating AI review: {e}")
-        review = generate_fallback_review(avg_rating, feedback, business_name, tags)
-        return review, "Fallback Template", avg_rating
+        count_fallback(e)
+        review, method = local_review(avg_rating, feedback, business_name, tags)
+        return [review], method, avg_rating
 
 
-def create_review_prompt(rating, feedback, business_name, tags, personality, target_words):
-    """Builds a comprehensive prompt with anti-AI guardrails and real examples."""
-    
-    # Build context naturally
-    context = f"Rating: {rating}⭐"
-    if feedback:
-        context += f"\nWhat happened: {feedback}"
-    if tags:
-        context += f"\nNotable: {tags}"
+async def agenerate_review_with_ai(ratings, feedback, business_name, tags=""):
+    """Async version of generate_review_with_ai using the async OpenAI client."""
+    drafts, generation_method, avg_rating = await agenerate_review_drafts(ratings, feedback, business_name, tags)
+    return drafts[0], generation_method, avg_rating
 
-    # Rating-specific tone guidance - FIXED FOR 3-STAR
-    tone_map = {
-        5: "excited and positive, mention what made it special",
-        4: "mostly happy, highlight what was good",
-        3: "neutral to slightly positive, it was decent/fine",
-        2: "disappointed but fair, explain what went wrong",
-        1: "frustrated and disappointed, be direct about what failed"
-    }
-    vibe = tone_map.get(rating, "neutral, balanced tone")
 
-    # Get real review examples for style reference
-    real_examples = get_example_reviews(rating, num_examples=2)
-    examples_section = ""
-    
-    if real_examples:
-        examples_text = "\n".join([f"- \"{ex.get('clean_text', '')}\"" for ex in real_examples])
-        examples_section = f"""
-Real Google reviews with similar ratings (for STYLE reference only):
-{examples_text}
+async def agenerate_review_drafts(ratings, feedback, business_name, tags="", count=1):
+    """Async version of generate_review_drafts using the async OpenAI client."""
+    if not ratings:
+        logger.error("Empty ratings dictionary provided")
+        return [generate_fallback_review(3, feedback, business_name, tags)], "Fallback", 3
 
-Match this natural, casual writing style.
-"""
+    avg_rating = average_rating(ratings)
+
+    try:
+        client = get_async_openai_client()
+
+        with time_stage("prompt"):
+            request = build_review_request(avg_rating, feedback, business_name, tags, count)
+        # A customer is waiting: give up after the latency budget, retries included
+        with OPENAI_BREAKER.guard(), time_stage("openai"):
+            async with asyncio.timeout(settings.OPENAI_LATENCY_BUDGET):
+                response = await client.chat.completions.create(**request)
+
+        record_prompt_usage(response.usage)
+
+        with time_stage("humanize"):
+            drafts = _humanize_drafts([choice.message.content for choice in response.choices], avg_rating)
+
+        logger.info(f"AI review generated ({len(drafts)} drafts, {len(drafts[0].split())} words)")
+        return drafts, "ChatGPT API", avg_rating
+
+    except Exception as e:
+        logger.error(f"Error generating AI review: {e}")
+        count_fallback(e)
+        review, method = local_review(avg_rating, feedback, business_name, tags)
+        return [review], method, avg_rating
+
+
+async def astream_review_with_ai(ratings, feedback, business_name, tags="", count=1):
+    """
+    Streaming variant of agenerate_review_with_ai.
+
+    Yields ("token", text) for each chunk as it arrives from the OpenAI
+    streaming API, then a single ("done", (ai_review, generation_method,
+    avg_rating)) event. The done event carries the humanized review, which
+    replaces the raw tokens shown so far. If the stream fails, the done
+    event carries a fallback review instead.
+
+    With `count` > 1 the same request asks for that many drafts. Only the
+    first is streamed as tokens; the others are collected, and all of them
+    come humanized in a ("drafts", [ai_review, ...]) event before done.
+    """
+    if not ratings:
+        logger.error("Empty ratings dictionary provided")
+        yield "done", (generate_fallback_review(3, feedback, business_name, tags), "Fallback", 3)
+        return
+
+    avg_rating = average_rating(ratings)
+
+    try:
+        client = get_async_openai_client()
+
+        with time_stage("prompt"):
+            request = build_review_request(avg_rating, feedback, business_name, tags, count)
+
+        # The openai stage runs from the request to the last chunk
+        with time_stage("openai"):
+            # The latency budget and the breaker cover the wait for the first
+            # chunk; once text is on screen the stream may take its time
+            with OPENAI_BREAKER.guard():
+                async with asyncio.timeout(settings.OPENAI_LATENCY_BUDGET):
+                    stream = await client.chat.completions.create(
+                        **request,
+                        stream=True,
+                        stream_options={"include_usage": True},  # final chunk carries token usage
+                    )
+                    first = await anext(stream, None)
+
+            parts = {}  # choice index -> text so far
+            for index, delta in _chunk_deltas(first) if first else []:
+                parts.setdefault(index, []).append(delta)
+                if index == 0:
+                    yield "token", delta
+
+            async for chunk in stream:
+                for index, delta in _chunk_deltas(chunk):
+                    parts.setdefault(index, []).append(delta)
+                    if index == 0:
+                        yield "token", delta
+
+        with time_stage("humanize"):
+            drafts = _humanize_drafts(["".join(parts[index]) for index in sorted(parts)], avg_rating)
+
+        logger.info(f"AI review streamed ({len(drafts)} drafts, {len(drafts[0].split())} words)")
+        if count > 1:
+            yield "drafts", drafts
+        yield "done", (drafts[0], "ChatGPT API", avg_rating)
+
+    except Exception as e:
+        logger.error(f"Error streaming AI review: {e}")
+        count_fallback(e)
+        review, method = local_review(avg_rating, feedback, business_name, tags)
+        yield "done", (review, method, avg_rating)
+
+
+# Static prompt prefix. Everything that is the same for every review lives
+# in the system message, built once at import and never changed, so the
+# provider can serve it from its prompt cache. Per-request details go in the
+# short user message that follows (create_review_prompt).
+REVIEW_SYSTEM_PROMPT = """You write quick, casual Google reviews. Be brief, imperfect, and natural. Avoid AI clichés.
 
-    # Anti-AI phrase blocklist
-    forbidden = """
 NEVER use these AI phrases:
 - "I recently visited"
 - "The ambiance was"
@@ -173,39 +392,154 @@ NEVER use these AI phrases:
 - Any meta-analysis or philosophical observations
 
 CRITICAL: Do NOT invent specific menu items, dishes, or products unless the customer specifically mentioned them in their feedback. Use general terms like "food", "meal", "order" instead.
+
+Rules:
+- Write like texting a friend - can be one long run-on sentence or short fragments
+- Focus on 1-2 things that mattered most
+- Use casual language ("pretty good", "kinda meh", "tbh", "solid", "decent")
+- Prefer commas over periods when connecting thoughts
+- NO corporate speak or flowery language
+- Don't mention everything, just what stood out
+- ONLY mention specific items/dishes if customer mentioned them in feedback
+- If no specific details provided, stay general ("food", "service", "place")
+- Match the style, tone and length asked for in the request
+- Reply with the review only, no intro"""
+
+PERSONALITIES = [
+    "busy professional - quick and blunt",
+    "college student - casual with some slang",
+    "foodie - focuses on taste and quality",
+    "regular customer - relaxed and familiar",
+    "first-timer - excited or disappointed"
+]
+
+REVIEW_LENGTHS = [
+    {"words": "15-25", "tokens": 40},
+    {"words": "30-45", "tokens": 70},
+    {"words": "50-70", "tokens": 100}
+]
+
+# Rating-specific tone guidance - FIXED FOR 3-STAR
+TONE_MAP = {
+    5: "excited and positive, mention what made it special",
+    4: "mostly happy, highlight what was good",
+    3: "neutral to slightly positive, it was decent/fine",
+    2: "disappointed but fair, explain what went wrong",
+    1: "frustrated and disappointed, be direct about what failed"
+}
+
+
+def build_review_request(avg_rating, feedback, business_name, tags, count=1):
+    """
+    Build the chat completion arguments with a random personality and length,
+    asking for `count` completions of the same prompt.
+    """
+    # Randomize personality and target length
+    personality = random.choice(PERSONALITIES)
+    length_config = random.choice(REVIEW_LENGTHS)
+
+    prompt = create_review_prompt(
+        avg_rating, feedback, business_name, tags, personality, length_config["words"]
+    )
+
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": REVIEW_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": int(length_config["tokens"]),
+        "temperature": 0.92,
+        "presence_penalty": 0.6,
+        "frequency_penalty": 0.7,
+        "top_p": 0.95,
+        "n": count,
+    }
+
+
+def create_review_prompt(rating, feedback, business_name, tags, personality, target_words):
+    """
+    Builds the per-request part of the prompt. The guardrails it relies on
+    are in REVIEW_SYSTEM_PROMPT, so keep anything static out of here.
+    """
+    # Build context naturally
+    context = f"Rating: {rating}⭐"
+    if feedback:
+        context += f"\nWhat happened: {feedback}"
+    if tags:
+        context += f"\nNotable: {tags}"
+
+    vibe = TONE_MAP.get(rating, "neutral, balanced tone")
+
+    # Get real review examples for style reference
+    real_examples = get_example_reviews(rating, num_examples=2)
+    examples_section = ""
+    
+    if real_examples:
+        examples_text = "\n".join([f"- \"{ex.get('clean_text', '')}\"" for ex in real_examples])
+        examples_section = f"""
+Real Google reviews with similar ratings (for STYLE reference only):
+{examples_text}
+
+Match this natural, casual writing style.
 """
 
     # Additional instruction based on feedback presence
     specificity_rule = ""
-    if not feedback or len(feedback.strip()) < 10:
+    if is_minimal_feedback(feedback):
         specificity_rule = "\nIMPORTANT: Customer gave minimal details. Keep the review VERY general. Only mention things from the tags or rating, nothing else."
 
     return f"""Write a Google review for {business_name}.
 
-    
-
-    
 {context}
-
 {examples_section}
-
 Style: {personality}
 Tone: {vibe}
-Length: {target_words} words MAX (seriously, keep it brief)
+Length: {target_words} words MAX (seriously, keep it brief){specificity_rule}
 
-{forbidden}
+Write the review now (no intro, just the review):"""
 
-Rules:
-- Write like texting a friend - can be one long run-on sentence or short fragments
-- Focus on 1-2 things that mattered most
-- Use casual language ("pretty good", "kinda meh", "tbh", "solid", "decent")
-- Prefer commas over periods when connecting thoughts
-- NO corporate speak or flowery language
-- Don't mention everything, just what stood out
-- ONLY mention specific items/dishes if customer mentioned them in feedback
-- If no specific details provided, stay general ("food", "service", "place"){specificity_rule}
 
-Write the review now (no intro, just the review):"""
+# Prompt cache accounting: totals for this process, see record_prompt_usage
+_prompt_usage = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+_prompt_usage_lock = threading.Lock()
+
+
+def record_prompt_usage(usage):
+    """
+    Log one call's prompt tokens split into cached and uncached, and add
+    them to the process totals and the token metrics.
+
+    Args:
+        usage: the `usage` object of a chat completion (or its last stream chunk)
+
+    Returns:
+        int: prompt tokens served from the provider's cache
+    """
+    if usage is None:
+        return 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) or 0
+    with _prompt_usage_lock:
+        _prompt_usage["calls"] += 1
+        _prompt_usage["prompt_tokens"] += usage.prompt_tokens
+        _prompt_usage["cached_tokens"] += cached
+    OPENAI_TOKENS.labels("prompt").inc(usage.prompt_tokens)
+    OPENAI_TOKENS.labels("cached_prompt").inc(cached)
+    OPENAI_TOKENS.labels("completion").inc(getattr(usage, "completion_tokens", None) or 0)
+    logger.info(
+        f"Prompt tokens: {usage.prompt_tokens} ({cached} cached, {usage.prompt_tokens - cached} uncached)"
+    )
+    return cached
+
+
+def prompt_usage_totals():
+    """
+    Returns:
+        dict: calls, prompt_tokens and cached_tokens recorded by this process
+    """
+    with _prompt_usage_lock:
+        return dict(_prompt_usage)
 
 
 # Humanization constants
@@ -226,6 +560,51 @@ HUMANIZERS = {
     "emojis": ["🔥", "👌", "💯"],
 }
 
+CONTRACTIONS = {
+    "I am": "I'm",
+    "do not": "don't",
+    "did not": "didn't",
+    "was not": "wasn't",
+    "is not": "isn't",
+    "would not": "wouldn't",
+    "will not": "won't",
+    "cannot": "can't",
+    "it is": "it's",
+    "that is": "that's",
+}
+
+INTENSIFIABLE = {"good", "bad", "nice", "slow", "fast", "busy", "quick"}
+
+AI_TRANSITIONS = [
+    "Additionally, ",
+    "Furthermore, ",
+    "Moreover, ",
+    "In addition, ",
+    "However, ",
+    "Nevertheless, ",
+]
+
+# Precompiled humanize() stages. Each stage is a single alternation regex
+# scanned once, with a callback picking the replacement for whatever matched.
+CASUAL_RE = re.compile(
+    "|".join(re.escape(formal) for formal in HUMANIZERS["casual_replacements"]),
+    re.IGNORECASE,
+)
+
+# "is not" is meant to win over "it is"/"that is" ("it is not" -> "it isn't"),
+# so those two only match when not followed by " not".
+CONTRACTIONS_RE = re.compile(
+    r"\b(?:" + "|".join(
+        re.escape(full) + (r"\b(?! not\b)" if full.endswith(" is") else r"\b")
+        for full in CONTRACTIONS
+    ) + ")",
+    re.IGNORECASE,
+)
+CONTRACTIONS_LOWER = {full.lower(): short for full, short in CONTRACTIONS.items()}
+
+EXCLAMATIONS_RE = re.compile(r'!{2,}')
+AI_TRANSITIONS_RE = re.compile("|".join(re.escape(t) for t in AI_TRANSITIONS))
+
 def humanize(text, rating):
     """
     Post-process AI output to add human imperfections and casual language.
@@ -239,14 +618,18 @@ def humanize(text, rating):
     """
     
     # 1. Replace overly formal words with casual alternatives
-    for formal, casual_options in HUMANIZERS["casual_replacements"].items():
-        if formal in text.lower():
-            replacement = random.choice(casual_options)
-            pattern = re.compile(re.escape(formal), re.IGNORECASE)
-            text = pattern.sub(replacement, text)
+    # (one replacement picked per word, in HUMANIZERS order)
+    found = {match.lower() for match in CASUAL_RE.findall(text)}
+    if found:
+        picked = {
+            formal: random.choice(casual_options)
+            for formal, casual_options in HUMANIZERS["casual_replacements"].items()
+            if formal in found
+        }
+        text = CASUAL_RE.sub(lambda m: picked[m.group(0).lower()], text)
     
     # 2. Remove quotation marks (AI loves these)
-    text = text.replace('"', '').replace("'", "'")
+    text = text.replace('"', '')
     
     # 3. Add casual starter (5% chance instead of 20%, or remove this section entirely)
     if random.random() < 0.05:  # Changed from 0.20 to 0.05
@@ -262,7 +645,7 @@ def humanize(text, rating):
         text = text[0].lower() + text[1:]
     
     # 6. Remove excessive exclamation marks
-    text = re.sub(r'!{2,}', '!', text)
+    text = EXCLAMATIONS_RE.sub('!', text)
     
     # 7. Add emoji for positive reviews (15% chance)
     if rating >= 4 and random.random() < 0.15:
@@ -270,47 +653,42 @@ def humanize(text, rating):
         text = f"{text} {emoji}"
     
     # 8. Apply common contractions
-    contractions = {
-        "I am": "I'm",
-        "do not": "don't",
-        "did not": "didn't",
-        "was not": "wasn't",
-        "is not": "isn't",
-        "would not": "wouldn't",
-        "will not": "won't",
-        "cannot": "can't",
-        "it is": "it's",
-        "that is": "that's",
-    }
-    for full, short in contractions.items():
-        text = re.sub(rf'\b{full}\b', short, text, flags=re.IGNORECASE)
+    text = CONTRACTIONS_RE.sub(lambda m: CONTRACTIONS_LOWER[m.group(0).lower()], text)
     
     # 9. Random intensifier injection (40% chance)
     words = text.split()
     if len(words) > 5 and random.random() < 0.40:
         # Find common adjectives to intensify
         for i in range(1, len(words) - 1):
-            if words[i].lower() in ["good", "bad", "nice", "slow", "fast", "busy", "quick"]:
+            if words[i].lower() in INTENSIFIABLE:
                 intensifier = random.choice(HUMANIZERS["intensifiers"])
                 words[i] = f"{intensifier} {words[i]}"
                 break
         text = " ".join(words)
     
     # 10. Remove AI-ish transition phrases
-    ai_transitions = [
-        "Additionally, ",
-        "Furthermore, ",
-        "Moreover, ",
-        "In addition, ",
-        "However, ",
-        "Nevertheless, ",
-    ]
-    for transition in ai_transitions:
-        text = text.replace(transition, "")
+    text = AI_TRANSITIONS_RE.sub("", text)
     
     return text.strip()
 
 
+def local_review(rating, feedback, business_name, tags=""):
+    """
+    Write the review without OpenAI, with the REVIEW_LOCAL_BACKEND backend.
+
+    Returns:
+        tuple: (review, generation_method)
+    """
+    from businesses.backends import get_backend  # backends builds on this module
+
+    try:
+        backend = get_backend()
+        return backend.generate(rating, feedback, business_name, tags), backend.method
+    except Exception as e:
+        logger.error(f"Local review backend failed: {e}")
+        return generate_fallback_review(rating, feedback, business_name, tags), "Fallback Template"
+
+
 def generate_fallback_review(rating, feedback, business_name, tags=""):
     """
     Simple backup review generator if GPT API fails.
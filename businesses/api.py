@@ -0,0 +1,142 @@
+"""
+Read-only REST API for integrations: businesses, review links and customer reviews.
+
+Every list is cursor paginated and every GET carries an ETag and a
+Last-Modified header built from one aggregate query over the owner's rows.
+A polling client that sends them back gets a 304 without the page query
+or any serialization running.
+"""
+import hashlib
+from datetime import datetime
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import IsAuthenticated
+
+from businesses.models import Business, CustomerReview, ReviewLink, ensure_review_links
+from businesses.pagination import REVIEW_PAGE_SIZE
+from businesses.serializers import BusinessSerializer, CustomerReviewSerializer, ReviewLinkSerializer
+
+
+class NewestFirstPagination(CursorPagination):
+    page_size = REVIEW_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class ReviewLinkPagination(NewestFirstPagination):
+    ordering = ('-id',)
+
+
+class ConditionalGetMixin:
+    """
+    Answers GETs with 304 Not Modified when nothing the response depends on changed.
+
+    Subclasses list `version_aggregates`, aggregates over get_queryset() that
+    change whenever the response would (e.g. a count plus the newest
+    timestamp, so deletes are caught as well as inserts and edits).
+    """
+    version_aggregates = {}
+    lookup_value_regex = r'\d+'
+
+    def get_version(self, queryset):
+        """
+        Returns:
+            (etag, last_modified) where last_modified is the newest
+            timestamp among the aggregates, or None
+        """
+        version = queryset.order_by().aggregate(**self.version_aggregates)
+        # Same data looks different per user, page, page size and ?fields=
+        key = f"{self.request.user.pk}|{self.request.get_full_path()}|{sorted(version.items())}"
+        timestamps = [value for value in version.values() if isinstance(value, datetime)]
+        return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"', max(timestamps, default=None)
+
+    def conditional(self, request, queryset, render):
+        etag, last_modified = self.get_version(queryset)
+        last_modified = last_modified.timestamp() if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        # Clients may keep the body but must revalidate before reusing it
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        render = super().list
+        return self.conditional(request, queryset, lambda: render(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        queryset = self.get_queryset().filter(**lookup)
+        render = super().retrieve
+        return self.conditional(request, queryset, lambda: render(request, *args, **kwargs))
+
+
+class BusinessViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = BusinessSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = NewestFirstPagination
+    version_aggregates = {
+        'count': Count('id'),
+        'updated_at': Max('updated_at'),
+        'stats_updated_at': Max('stats_updated_at'),
+        'links': Count('review_link'),
+    }
+
+    def get_queryset(self):
+        return Business.objects.filter(owner=self.request.user).select_related('review_link')
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        return ensure_review_links(page) if page is not None else None
+
+    def get_object(self):
+        return ensure_review_links([super().get_object()])[0]
+
+
+class ReviewLinkViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = ReviewLinkSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ReviewLinkPagination
+    version_aggregates = {
+        'count': Count('id'),
+        'clicks': Sum('click_count'),
+        'updated_at': Max('business__updated_at'),
+    }
+
+    def get_queryset(self):
+        return ReviewLink.objects.filter(business__owner=self.request.user).select_related('business')
+
+
+class CustomerReviewViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """Reviews are never edited, so the count and newest timestamp identify a version."""
+    serializer_class = CustomerReviewSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = NewestFirstPagination
+    version_aggregates = {
+        'count': Count('id'),
+        'created_at': Max('created_at'),
+        'updated_at': Max('business__updated_at'),  # business_name is in the payload
+    }
+
+    def get_queryset(self):
+        reviews = CustomerReview.objects.filter(business__owner=self.request.user).select_related('business')
+        business = self.request.query_params.get('business')
+        if business:
+            if not business.isdigit():
+                raise ValidationError({'business': 'Expected a business id.'})
+            # ?business=<id> walks the (business, -created_at, -id) index
+            reviews = reviews.filter(business_id=business)
+        return reviews
@@ -0,0 +1,195 @@
+"""
+Local review backends, used when OpenAI can't write the review (an error,
+the circuit breaker is open, the latency budget ran out).
+
+A backend turns (rating, feedback, business name, tags) into review text
+without any network call. REVIEW_LOCAL_BACKEND picks one:
+
+    template  the fixed f-string templates in ai_service
+    ngram     a rating-conditioned word n-gram model learned from the
+              review dataset (businesses/data/restaurant_reviews.json)
+
+The dataset isn't part of the repository, so the n-gram backend is
+opt-in: choosing it without the dataset is an ImproperlyConfigured error
+(also reported by `manage.py check`, see businesses/checks.py) rather
+than quietly serving templates.
+"""
+import abc
+import logging
+import os
+import random
+import re
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from businesses.ai_service import (
+    RATINGS, REVIEWS_PATH, generate_fallback_review, is_minimal_feedback, load_review_dataset,
+)
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+class ReviewBackend(abc.ABC):
+    """Writes a review locally. Subclasses set `method` and implement generate()."""
+    method = None  # generation_method reported for its reviews
+
+    def available(self):
+        return True
+
+    @abc.abstractmethod
+    def generate(self, rating, feedback, business_name, tags=""):
+        """
+        Args:
+            rating (int): star rating (1-5)
+            feedback (str): optional customer notes
+            business_name (str): name of the business
+            tags (str): optional highlights
+
+        Returns:
+            str: review text
+        """
+
+
+class TemplateBackend(ReviewBackend):
+    method = "Fallback Template"
+
+    def generate(self, rating, feedback, business_name, tags=""):
+        return generate_fallback_review(rating, feedback, business_name, tags)
+
+
+class NgramBackend(ReviewBackend):
+    """
+    Random walk over word n-grams seen in real reviews with the same rating.
+
+    Training keeps, per rating, every sentence opening and, for each run of
+    `order` words, the list of words that followed it (repeats included, so
+    random.choice picks in proportion to how often they were seen). A
+    review is a walk from a random opening until a sentence ends after at
+    least `min_words` words. Generating is a few dozen dict lookups.
+    """
+    method = "Local N-gram"
+
+    def __init__(self, reviews=None, order=2, min_words=12, max_words=45):
+        """
+        Args:
+            reviews (list): review dicts with 'stars' and 'clean_text'; the dataset by default
+            order (int): words of context per step; higher reads better but copies more
+            min_words (int): keep adding sentences until the review is this long
+            max_words (int): stop mid-sentence past this length
+        """
+        self.order = order
+        self.min_words = min_words
+        self.max_words = max_words
+        if reviews is None:
+            reviews = load_review_dataset()
+        self.models = self._train(reviews)
+
+    def _train(self, reviews):
+        by_stars = {}
+        for review in reviews:
+            text = (review.get('clean_text') or '').strip()
+            if text:
+                by_stars.setdefault(review.get('stars'), []).append(text)
+
+        models = {}
+        for rating in RATINGS:
+            # Ratings the dataset lacks borrow from their neighbours
+            texts = by_stars.get(rating) or by_stars.get(rating + 1, []) + by_stars.get(rating - 1, [])
+            if texts:
+                models[rating] = self._train_rating(texts)
+        return models
+
+    def _train_rating(self, texts):
+        starts, following = [], {}
+        for text in texts:
+            for sentence in SENTENCE_RE.split(text):
+                words = sentence.split()
+                if len(words) <= self.order:
+                    continue
+                starts.append(tuple(words[:self.order]))
+                # None after the last run marks the end of a sentence
+                for i, word in enumerate(words[self.order:] + [None]):
+                    following.setdefault(tuple(words[i:i + self.order]), []).append(word)
+        return starts, following
+
+    def available(self):
+        return bool(self.models)
+
+    def generate(self, rating, feedback, business_name, tags=""):
+        starts, following = self.models[min(self.models, key=lambda r: abs(r - rating))]
+
+        words = list(random.choice(starts))
+        while len(words) < self.max_words:
+            # Every state was seen with a successor, None marking a sentence end
+            word = random.choice(following[tuple(words[-self.order:])])
+            if word is not None:
+                words.append(word)
+            elif len(words) >= self.min_words:
+                break
+            else:
+                words.extend(random.choice(starts))
+        text = " ".join(words)
+
+        # Say what the customer said first, like the templates do
+        if not is_minimal_feedback(feedback):
+            text = f"{feedback.strip().rstrip('.')}. {text}"
+        if tags:
+            text = f"{text} {tags}"
+        return text
+
+
+BACKENDS = {
+    "template": TemplateBackend,
+    "ngram": NgramBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def configuration_error(name):
+    """
+    Returns:
+        str: what is wrong with REVIEW_LOCAL_BACKEND = `name`, or None if it can be built
+    """
+    if name not in BACKENDS:
+        return f"REVIEW_LOCAL_BACKEND must be one of {', '.join(BACKENDS)}, not {name!r}"
+    if name == "ngram" and not os.path.exists(REVIEWS_PATH):
+        return (
+            f"REVIEW_LOCAL_BACKEND 'ngram' needs the review dataset at {REVIEWS_PATH}; "
+            "add it or use the 'template' backend"
+        )
+    return None
+
+
+def build_backend(name):
+    """
+    Raises:
+        ImproperlyConfigured: `name` isn't one of BACKENDS, or it has no data to learn from
+    """
+    error = configuration_error(name)
+    if error:
+        raise ImproperlyConfigured(error)
+    backend = BACKENDS[name]()
+    if not backend.available():
+        raise ImproperlyConfigured(f"Local review backend {name!r} has no reviews to learn from in {REVIEWS_PATH}")
+    return backend
+
+
+def get_backend():
+    """Return the process-wide local backend, training it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = build_backend(settings.REVIEW_LOCAL_BACKEND)
+    return _backend
+
+
+def warm_up_local_backend():
+    """Train the local backend in the background at worker boot, so an OpenAI outage doesn't wait for it."""
+    threading.Thread(target=get_backend, name="local-backend-warmup", daemon=True).start()
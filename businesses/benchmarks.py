@@ -0,0 +1,212 @@
+"""
+Micro-benchmarks for the review hot paths, run by `manage.py bench_suite`.
+
+Each benchmark times one call of a hot path (a few ai_service functions,
+QR rendering, and full test-client requests for the dashboard and review
+pages) and, for requests, counts its SQL queries. Results are plain dicts
+so they can be saved as JSON and compared with a stored baseline:
+
+    python manage.py bench_suite --update-baseline   # on main
+    python manage.py bench_suite                     # on a branch, fails on a regression
+    python manage.py bench_suite --no-baseline       # just print the timings
+
+The committed benchmarks/baseline.json is the reference; without a
+baseline the comparison fails rather than passing by default. Timings only
+compare on the same machine (refresh the baseline there with
+--update-baseline); query counts compare anywhere.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from businesses import ai_service, clicks
+from businesses.models import Business, CustomerReview, ensure_review_links
+
+User = get_user_model()
+
+SAMPLE_REVIEWS = [
+    "The food was very good and the staff were excellent. It is not cheap, though.",
+    "Absolutely delicious!!! I am coming back for sure. That is not a joke.",
+    "Additionally, the wait was terrible. However, the desserts were wonderful.",
+    "Service was quite slow and I did not love it. Furthermore, it is loud inside.",
+]
+
+# Templates reference static files; don't require collectstatic's manifest
+BENCH_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class BenchmarkError(Exception):
+    """A benchmarked request didn't return 200, so its timing means nothing."""
+
+
+def time_call(func, number, rounds):
+    """
+    Returns:
+        tuple: (median, fastest) seconds per call over `rounds` rounds of `number` calls
+    """
+    func()  # warm up caches, lazy imports and the connection
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - start) / number)
+    return statistics.median(per_call), min(per_call)
+
+
+def count_queries(func):
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    return len(queries.captured_queries)
+
+
+@contextmanager
+def example_dataset(size=10000):
+    """
+    A fixed synthetic review dataset in place of the real one, so the
+    example-review and prompt timings don't depend on which dataset file
+    is deployed (or whether there is one).
+    """
+    original = ai_service.REVIEW_DATASET, ai_service.REVIEW_INDEX
+    dataset = [
+        {'stars': 1 + i % 5, 'clean_text': SAMPLE_REVIEWS[i % len(SAMPLE_REVIEWS)]}
+        for i in range(size)
+    ]
+    ai_service.REVIEW_DATASET = dataset
+    ai_service.REVIEW_INDEX = ai_service.build_review_index(dataset)
+    try:
+        yield
+    finally:
+        ai_service.REVIEW_DATASET, ai_service.REVIEW_INDEX = original
+
+
+@contextmanager
+def benchmark_data(businesses=10, reviews_per_business=50):
+    """
+    An owner with businesses, review links and reviews, and a client logged
+    in as them. Everything is rolled back afterwards.
+    """
+    with transaction.atomic(), override_settings(STORAGES=BENCH_STORAGES, ALLOWED_HOSTS=['*']):
+        owner = User.objects.create_user(username='bench-suite', password=None)
+        Business.objects.bulk_create(
+            Business(owner=owner, name=f'Benchmark Bistro {i}', google_review_url='https://example.com/review')
+            for i in range(businesses)
+        )
+        created = ensure_review_links(Business.objects.filter(owner=owner).select_related('review_link'))
+        CustomerReview.objects.bulk_create(
+            CustomerReview(
+                business=business, review_link=business.review_link, rating=1 + i % 5,
+                feedback='Great coffee', ai_review=SAMPLE_REVIEWS[i % len(SAMPLE_REVIEWS)],
+            )
+            for business in created for i in range(reviews_per_business)
+        )
+
+        client = Client()
+        client.force_login(owner)
+        try:
+            yield SimpleNamespace(client=client, business=created[0], link=created[0].review_link)
+        finally:
+            clicks.flush_clicks()  # inside the transaction, so it's rolled back too
+            transaction.set_rollback(True)
+
+
+def page(client, url):
+    """A function fetching `url`, checking that it worked."""
+    def get():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise BenchmarkError(f'GET {url} returned {response.status_code}')
+        return response
+    return get
+
+
+def hot_paths(data):
+    """
+    Returns:
+        dict: name -> (function to time, calls per round, counts queries)
+    """
+    business, link = data.business, data.link
+    client = data.client
+    return {
+        'ai.get_example_reviews': (lambda: ai_service.get_example_reviews(random.randint(1, 5), 2), 5000, False),
+        'ai.create_review_prompt': (
+            lambda: ai_service.create_review_prompt(
+                4, 'Great coffee, slow service', 'Benchmark Bistro', 'coffee',
+                ai_service.PERSONALITIES[0], '15-25',
+            ),
+            5000, False,
+        ),
+        'ai.humanize': (lambda: ai_service.humanize(random.choice(SAMPLE_REVIEWS), random.randint(1, 5)), 5000, False),
+        'ai.generate_fallback_review': (
+            lambda: ai_service.generate_fallback_review(random.randint(1, 5), 'Great coffee', 'Benchmark Bistro'),
+            20000, False,
+        ),
+        'qr.png': (page(client, reverse('businesses:qr_code', args=[link.token]) + '?size=10'), 20, True),
+        'qr.svg': (page(client, reverse('businesses:qr_code', args=[link.token]) + '?format=svg'), 20, True),
+        'page.dashboard': (page(client, reverse('businesses:dashboard')), 50, True),
+        'page.analytics': (page(client, reverse('businesses:analytics') + f'?business={business.id}'), 50, True),
+        'page.business_detail': (page(client, reverse('businesses:business_detail', args=[business.id])), 50, True),
+        'page.business_reviews': (page(client, reverse('businesses:business_reviews', args=[business.id])), 50, True),
+        'page.review_form': (page(client, reverse('reviews:review_form', args=[link.token])), 50, True),
+    }
+
+
+def run_benchmarks(only=None, rounds=5, scale=1.0):
+    """
+    Args:
+        only (list): name prefixes to run, all by default
+        rounds (int): timed rounds per benchmark; the median is reported
+        scale (float): multiplies the calls per round, lower for a quick run
+
+    Returns:
+        dict: name -> {"seconds": median per call, "fastest": ..., "queries": count or None}
+    """
+    random.seed(0)
+    results = {}
+    with example_dataset(), benchmark_data() as data:
+        for name, (func, number, has_queries) in hot_paths(data).items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            seconds, fastest = time_call(func, max(1, int(number * scale)), rounds)
+            results[name] = {
+                'seconds': seconds,
+                'fastest': fastest,
+                'queries': count_queries(func) if has_queries else None,
+            }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare a run with a baseline run.
+
+    A benchmark regressed if it got more than `tolerance` (a fraction)
+    slower or made more queries than in the baseline.
+
+    Returns:
+        tuple: (rows, regressions); rows are (name, result, baseline result or None, relative change)
+    """
+    rows, regressions = [], []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            rows.append((name, result, None, None))
+            continue
+        change = result['seconds'] / before['seconds'] - 1
+        rows.append((name, result, before, change))
+        if change > tolerance:
+            regressions.append(f"{name} is {change:.0%} slower")
+        if before.get('queries') is not None and (result['queries'] or 0) > before['queries']:
+            regressions.append(f"{name} makes {result['queries']} queries, was {before['queries']}")
+    return rows, regressions
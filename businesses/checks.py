@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_local_review_backend(app_configs, **kwargs):
+    """Report a REVIEW_LOCAL_BACKEND that can't be built at deploy time, not during an OpenAI outage."""
+    from businesses.backends import configuration_error
+
+    error = configuration_error(settings.REVIEW_LOCAL_BACKEND)
+    if error:
+        return [Error(error, id='businesses.E001')]
+    return []
@@ -0,0 +1,156 @@
+"""
+Circuit breaker for calls to a flaky upstream (the OpenAI API).
+
+While closed, calls go through and their outcomes are kept in a rolling
+window. Once enough of the recent calls failed or were slow, the breaker
+opens and calls fail immediately with CircuitOpenError, so requests get
+the fallback review at once instead of each waiting out a timeout. After
+`open_seconds` it lets a few probe calls through (half-open): if they
+succeed it closes again, if not it re-opens.
+
+One breaker is shared by every request in a worker process. Each allowed
+call gets a Permit naming the state it was let through in, so a slow call
+let through while closed that finishes after the breaker has moved on
+neither counts in the new window nor passes for a probe.
+"""
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the breaker is open."""
+
+
+# generation: bumped on every state change; probe: let through while half-open
+Permit = namedtuple('Permit', ['generation', 'probe'])
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_rate=0.5, window=20, min_calls=5,
+                 slow_call_seconds=5.0, open_seconds=30.0, half_open_probes=1, clock=time.monotonic):
+        """
+        Args:
+            name (str): used in log messages
+            failure_rate (float): share of failed or slow calls in the window that opens the breaker
+            window (int): number of recent calls considered
+            min_calls (int): don't judge the failure rate on fewer calls than this
+            slow_call_seconds (float): successful calls slower than this count as failures
+            open_seconds (float): how long to reject calls before probing
+            half_open_probes (int): calls let through at once while probing
+            clock: monotonic time source, replaceable in tests
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # True for a good call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._generation = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        """
+        Ask to make a call now. Every permit must be handed back to record() or release().
+
+        Returns:
+            Permit, or None when the call must not go ahead
+        """
+        with self._lock:
+            if self._state == OPEN:
+                if self.clock() - self._opened_at < self.open_seconds:
+                    return None
+                self._set_state(HALF_OPEN)
+                self._probes = 0
+                logger.info(f"{self.name} circuit half-open, probing")
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    return None
+                self._probes += 1
+                return Permit(self._generation, probe=True)
+            return Permit(self._generation, probe=False)
+
+    def record(self, permit, ok, duration=0.0):
+        """Record the outcome of the call `permit` let through."""
+        good = ok and duration <= self.slow_call_seconds
+        with self._lock:
+            if permit.generation != self._generation:
+                return  # let through before the last state change; says nothing about now
+            if permit.probe:
+                self._probes -= 1
+                if good:
+                    self._set_state(CLOSED)
+                    self._outcomes.clear()
+                    logger.info(f"{self.name} circuit closed")
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append(good)
+            failures = self._outcomes.count(False)
+            if (
+                self._state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open()
+
+    def release(self, permit):
+        """The call `permit` let through was abandoned (e.g. the client went away) without an outcome."""
+        with self._lock:
+            if permit.probe and permit.generation == self._generation:
+                self._probes -= 1
+
+    def _set_state(self, state):
+        self._state = state
+        self._generation += 1
+
+    def _open(self):
+        self._set_state(OPEN)
+        self._opened_at = self.clock()
+        self._outcomes.clear()
+        logger.warning(f"{self.name} circuit open for {self.open_seconds:.0f}s")
+
+    @contextmanager
+    def guard(self):
+        """
+        Run the body of the with block as one call through the breaker.
+
+        Raises:
+            CircuitOpenError: the breaker is open; the body is not run
+        """
+        permit = self.allow()
+        if permit is None:
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        start = self.clock()
+        recorded = False
+        try:
+            yield
+            recorded = True
+            self.record(permit, True, self.clock() - start)
+        except Exception:
+            recorded = True
+            self.record(permit, False)
+            raise
+        finally:
+            if not recorded:  # cancelled or closed mid-call
+                self.release(permit)
@@ -0,0 +1,171 @@
+"""
+Buffered click counting for review links.
+
+Scanning a QR code used to do a read-modify-write save() on the ReviewLink
+row, which lost increments under concurrency and made every scan wait on the
+row lock. Clicks are now counted in the shared cache (one cache.incr per
+scan) and written in batches with F() updates, one UPDATE per link per
+flush.
+
+The counts live outside the worker, so a worker killed by SIGKILL, a
+timeout or a restart doesn't take unwritten clicks with it; any process can
+flush them. Links with unwritten clicks are listed under numbered "dirty"
+keys, so a flush reads only those. A flush subtracts what it wrote only
+after its transaction commits: a process dying in between makes those
+clicks count twice, never zero times.
+
+Without a shared cache (no REDIS_URL) there is nothing that outlives the
+process to buffer in, so CLICK_BUFFERED is off and every click is written
+straight away.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from businesses.models import ReviewLink
+from businesses.rollups import record_clicks
+
+logger = logging.getLogger(__name__)
+
+COUNT_KEY = "clicks:link:{}"  # review_link_id -> clicks not yet written
+DIRTY_KEY = "clicks:dirty:{}"  # sequence number -> review_link_id with clicks not yet written
+DIRTY_NEXT = "clicks:dirty:next"  # last sequence number handed out
+DIRTY_DONE = "clicks:dirty:done"  # last sequence number flushed
+FLUSH_LOCK = "clicks:flush:lock"
+FLUSH_LOCK_TIMEOUT = 60
+
+_since_flush = 0  # clicks this process recorded since it last flushed
+_last_flush = time.monotonic()
+_lock = threading.Lock()
+_flusher = None
+
+
+def _incr(key, delta=1):
+    """cache.incr, creating the counter (without expiry) on first use."""
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, delta)
+
+
+def _mark_dirty(review_link_id):
+    cache.set(DIRTY_KEY.format(_incr(DIRTY_NEXT)), review_link_id, timeout=None)
+
+
+def _write_clicks(batch):
+    with transaction.atomic():
+        # Sorted so concurrent flushes lock rows in the same order
+        for review_link_id, count in sorted(batch.items()):
+            ReviewLink.objects.filter(pk=review_link_id).update(
+                click_count=F('click_count') + count
+            )
+        record_clicks(batch)
+
+
+def record_click(review_link_id):
+    """Count one click, writing the buffer out if it is due."""
+    global _since_flush
+    if not settings.CLICK_BUFFERED:
+        _write_clicks({review_link_id: 1})
+        return
+
+    if _incr(COUNT_KEY.format(review_link_id)) == 1:
+        _mark_dirty(review_link_id)  # first click since the link was last flushed
+    with _lock:
+        _since_flush += 1
+        due = (
+            _since_flush >= settings.CLICK_FLUSH_THRESHOLD
+            or time.monotonic() - _last_flush >= settings.CLICK_FLUSH_INTERVAL
+        )
+    _ensure_flusher()
+    if due:
+        flush_clicks()
+
+
+def pending_clicks(review_link_id):
+    """Clicks recorded but not yet written to the database."""
+    return cache.get(COUNT_KEY.format(review_link_id), 0)
+
+
+def flush_clicks():
+    """
+    Write all buffered clicks to the database. One process flushes at a
+    time; the others skip, since the flush in progress covers their clicks.
+
+    Returns:
+        int: number of clicks written
+    """
+    global _since_flush, _last_flush
+    with _lock:
+        _since_flush = 0
+        _last_flush = time.monotonic()
+
+    if not settings.CLICK_BUFFERED or not cache.add(FLUSH_LOCK, True, FLUSH_LOCK_TIMEOUT):
+        return 0
+    try:
+        return _flush_dirty_links()
+    finally:
+        cache.delete(FLUSH_LOCK)
+
+
+def _flush_dirty_links():
+    done = cache.get(DIRTY_DONE, 0)
+    dirty_keys = [DIRTY_KEY.format(n) for n in range(done + 1, cache.get(DIRTY_NEXT, 0) + 1)]
+    marked = cache.get_many(dirty_keys)
+    # A key can be numbered but not written yet; stop before it and pick it up next time
+    flushed_keys = []
+    for key in dirty_keys:
+        if key not in marked:
+            break
+        flushed_keys.append(key)
+    if not flushed_keys:
+        return 0
+
+    link_ids = {marked[key] for key in flushed_keys}
+    counts = cache.get_many([COUNT_KEY.format(link_id) for link_id in link_ids])
+    batch = {link_id: counts.get(COUNT_KEY.format(link_id), 0) for link_id in link_ids}
+    batch = {link_id: count for link_id, count in batch.items() if count > 0}
+
+    try:
+        _write_clicks(batch)
+    except Exception as e:
+        # Nothing was subtracted, so the clicks stay buffered for the next flush
+        logger.error(f"Failed to flush {sum(batch.values())} clicks, will retry: {e}")
+        return 0
+
+    for link_id, count in batch.items():
+        if cache.decr(COUNT_KEY.format(link_id), count) > 0:
+            _mark_dirty(link_id)  # clicked again during the flush
+    cache.set(DIRTY_DONE, done + len(flushed_keys), timeout=None)
+    cache.delete_many(flushed_keys)
+    return sum(batch.values())
+
+
+def _ensure_flusher():
+    """Start a background thread so idle processes still flush on time."""
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_periodically, name="click-flusher", daemon=True)
+            _flusher.start()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.CLICK_FLUSH_INTERVAL)
+        with _lock:
+            idle = _since_flush == 0
+        if not idle:
+            flush_clicks()
+
+
+atexit.register(flush_clicks)
@@ -42,7 +42,7 @@ class LoginForm(forms.Form):
 class BusinessForm(forms.ModelForm):
     class Meta:
         model = Business
-        fields = ['name', 'address', 'google_review_url', 'place_id'] 
+        fields = ['name', 'address', 'google_review_url', 'place_id', 'ip_rate_limit', 'link_rate_limit']
         widgets = {
             'address': forms.Textarea(attrs={'rows': 3}),
             'google_review_url': forms.URLInput(attrs={
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from businesses.models import CustomerReview, DailyReviewStats
+from businesses.rollups import RATING_FIELDS, REVIEW_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the review counts in DailyReviewStats from CustomerReview. '
+        'Click counts are left alone: only lifetime totals exist for past clicks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help='Only rebuild this business id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        reviews = CustomerReview.objects.all()
+        existing = DailyReviewStats.objects.all()
+        if options['business']:
+            reviews = reviews.filter(business_id=options['business'])
+            existing = existing.filter(business_id=options['business'])
+
+        # One grouped query: (business, day, rating) -> count
+        totals = {}
+        grouped = (
+            reviews.annotate(day=TruncDate('created_at'))
+            .values('business_id', 'day', 'rating')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        for row in grouped:
+            stats = totals.setdefault((row['business_id'], row['day']), dict.fromkeys(REVIEW_FIELDS, 0))
+            stats['submissions'] += row['count']
+            stats['rating_sum'] += row['rating'] * row['count']
+            if row['rating'] in RATING_FIELDS:
+                stats[RATING_FIELDS[row['rating']]] += row['count']
+
+        with transaction.atomic():
+            existing.update(**dict.fromkeys(REVIEW_FIELDS, 0))
+
+            to_update = []
+            for stats_row in existing.filter(date__in={day for _, day in totals}):
+                stats = totals.pop((stats_row.business_id, stats_row.date), None)
+                if stats:
+                    for field, value in stats.items():
+                        setattr(stats_row, field, value)
+                    to_update.append(stats_row)
+            DailyReviewStats.objects.bulk_update(to_update, REVIEW_FIELDS, batch_size=options['batch_size'])
+
+            to_create = [
+                DailyReviewStats(business_id=business_id, date=day, **stats)
+                for (business_id, day), stats in totals.items()
+            ]
+            DailyReviewStats.objects.bulk_create(to_create, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(to_update)} existing and {len(to_create)} new daily rollups'
+        ))
@@ -0,0 +1,45 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from businesses import ai_service
+
+
+class Command(BaseCommand):
+    help = 'Measures get_example_reviews latency as the review dataset grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000,1000000',
+                            help='Comma separated dataset sizes to test')
+        parser.add_argument('--calls', type=int, default=10000,
+                            help='Number of get_example_reviews calls per size')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        calls = options['calls']
+
+        original = ai_service.REVIEW_DATASET, ai_service.REVIEW_INDEX
+        try:
+            for size in sizes:
+                dataset = [
+                    {'stars': random.randint(1, 5), 'clean_text': f'review {i}'}
+                    for i in range(size)
+                ]
+
+                start = time.perf_counter()
+                ai_service.REVIEW_DATASET = dataset
+                ai_service.REVIEW_INDEX = ai_service.build_review_index(dataset)
+                build_ms = (time.perf_counter() - start) * 1000
+
+                start = time.perf_counter()
+                for _ in range(calls):
+                    ai_service.get_example_reviews(random.randint(1, 5), num_examples=2)
+                per_call_us = (time.perf_counter() - start) / calls * 1_000_000
+
+                self.stdout.write(
+                    f'{size:>9} reviews: index built in {build_ms:8.1f} ms, '
+                    f'{per_call_us:6.2f} µs per call'
+                )
+        finally:
+            ai_service.REVIEW_DATASET, ai_service.REVIEW_INDEX = original
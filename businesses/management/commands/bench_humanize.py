@@ -0,0 +1,43 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from businesses.ai_service import humanize
+
+SAMPLE_REVIEWS = [
+    "The food was very good and the staff were excellent. It is not cheap, though.",
+    "Absolutely delicious!!! I am coming back for sure. That is not a joke.",
+    "Additionally, the wait was terrible. However, the desserts were wonderful.",
+    "Service was quite slow and I did not love it. Furthermore, it is loud inside.",
+    "We cannot wait to return, the pasta was extremely good and the staff nice.",
+    "Solid spot for a quick lunch, fast service and good portions.",
+]
+
+
+class Command(BaseCommand):
+    help = 'Reports humanize() throughput in reviews per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviews', type=int, default=200000,
+                            help='Number of reviews to humanize')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed for the random module')
+
+    def handle(self, *args, **options):
+        total = options['reviews']
+        random.seed(options['seed'])
+        batch = [
+            (SAMPLE_REVIEWS[i % len(SAMPLE_REVIEWS)], 1 + i % 5)
+            for i in range(total)
+        ]
+
+        start = time.perf_counter()
+        for text, rating in batch:
+            humanize(text, rating)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f'humanized {total} reviews in {elapsed:.2f} s: '
+            f'{total / elapsed:,.0f} reviews/sec ({elapsed / total * 1_000_000:.1f} µs each)'
+        )
@@ -0,0 +1,66 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from businesses import backends
+from businesses.ai_service import load_review_dataset
+
+# Used to build a stand-in corpus when the review dataset isn't there
+SYNTHETIC_PHRASES = [
+    "the food was", "really good", "kinda cold", "service was slow", "staff were friendly",
+    "would come back", "not worth the price", "great portions", "a bit loud", "we waited ages",
+    "fresh and tasty", "pretty solid spot", "the coffee", "nothing special", "best in town",
+]
+
+
+def synthetic_reviews(count):
+    return [
+        {
+            'stars': random.randint(1, 5),
+            'clean_text': '. '.join(
+                ' '.join(random.sample(SYNTHETIC_PHRASES, 4)) for _ in range(random.randint(1, 3))
+            ) + '.',
+        }
+        for _ in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Reports training time and reviews per second for each local review backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviews', type=int, default=100000,
+                            help='Number of reviews to generate per backend')
+        parser.add_argument('--synthetic', type=int, default=20000,
+                            help='Size of the stand-in corpus when the dataset is missing')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed for the random module')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        total = options['reviews']
+
+        dataset = load_review_dataset()
+        if not dataset:
+            self.stdout.write(self.style.WARNING(
+                f"review dataset not found, training on {options['synthetic']} synthetic reviews"
+            ))
+            dataset = synthetic_reviews(options['synthetic'])
+
+        start = time.perf_counter()
+        ngram = backends.NgramBackend(reviews=dataset)
+        self.stdout.write(f'n-gram model trained on {len(dataset)} reviews in {time.perf_counter() - start:.2f} s')
+
+        for backend in (backends.TemplateBackend(), ngram):
+            batch = [(1 + i % 5, '', 'Benchmark Bistro') for i in range(total)]
+            start = time.perf_counter()
+            for rating, feedback, business_name in batch:
+                backend.generate(rating, feedback, business_name)
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f'{backend.method}: {total} reviews in {elapsed:.2f} s, '
+                f'{total / elapsed:,.0f} reviews/sec ({elapsed / total * 1_000_000:.1f} µs each)'
+            )
+            self.stdout.write(f'  e.g. "{backend.generate(5, "", "Benchmark Bistro")}"')
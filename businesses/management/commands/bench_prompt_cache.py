@@ -0,0 +1,56 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from businesses.ai_service import REVIEW_SYSTEM_PROMPT, generate_review_with_ai, prompt_usage_totals
+
+MIN_CACHEABLE_TOKENS = 1024  # OpenAI only caches prompts at least this long
+
+
+class Command(BaseCommand):
+    help = (
+        'Makes real review generations and reports how many prompt tokens the '
+        'provider served from its prompt cache, and the latency with and without hits'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=20)
+        parser.add_argument('--business', default='Benchmark Bistro',
+                            help='Business name to write the reviews for')
+
+    def handle(self, *args, **options):
+        if not settings.OPENAI_API_KEY:
+            raise CommandError('OPENAI_API_KEY is not set')
+
+        # ~4 characters per token is close enough to tell if caching can apply
+        prefix_tokens = len(REVIEW_SYSTEM_PROMPT) // 4
+        self.stdout.write(f'static prefix: {len(REVIEW_SYSTEM_PROMPT)} chars, ~{prefix_tokens} tokens')
+        if prefix_tokens < MIN_CACHEABLE_TOKENS:
+            self.stdout.write(self.style.WARNING(
+                f'prompts shorter than {MIN_CACHEABLE_TOKENS} tokens are never cached; expect 0 cached tokens'
+            ))
+
+        hits, misses = [], []
+        for i in range(options['calls']):
+            before = prompt_usage_totals()
+            start = time.perf_counter()
+            _, method, _ = generate_review_with_ai({'overall': 1 + i % 5}, '', options['business'])
+            elapsed = (time.perf_counter() - start) * 1000
+            after = prompt_usage_totals()
+
+            if method != 'ChatGPT API':
+                raise CommandError('OpenAI call failed, see the log')
+            cached = after['cached_tokens'] - before['cached_tokens']
+            (hits if cached else misses).append(elapsed)
+
+        totals = prompt_usage_totals()
+        share = totals['cached_tokens'] / totals['prompt_tokens'] if totals['prompt_tokens'] else 0
+        self.stdout.write(
+            f"{totals['calls']} calls, {totals['prompt_tokens']} prompt tokens, "
+            f"{totals['cached_tokens']} cached ({share:.0%})"
+        )
+        for label, timings in (('cache hit', hits), ('cache miss', misses)):
+            if timings:
+                self.stdout.write(f'{label}: {len(timings)} calls, median {statistics.median(timings):.0f} ms')
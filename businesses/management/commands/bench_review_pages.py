@@ -0,0 +1,106 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from businesses.models import Business, CustomerReview, ReviewLink
+from businesses.pagination import REVIEW_PAGE_SIZE, encode_cursor, paginate_reviews
+
+User = get_user_model()
+
+DEPTHS = [0, 0.01, 0.1, 0.5, 0.99]  # fraction of the way into the listing
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares keyset and OFFSET page latency at increasing depth into one business '
+        'with many reviews. Runs inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviews', type=int, default=1_000_000,
+                            help='Reviews to create for the benchmark business')
+        parser.add_argument('--other-reviews', type=int, default=100_000,
+                            help='Reviews spread over other businesses sharing the table')
+        parser.add_argument('--page-size', type=int, default=REVIEW_PAGE_SIZE)
+        parser.add_argument('--samples', type=int, default=5,
+                            help='Timed runs per page; the median is reported')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            business = self.create_reviews(options)
+            self.report(business, options)
+            transaction.set_rollback(True)
+
+    def create_reviews(self, options):
+        owner = User.objects.create_user(username='bench-review-pages', password=None)
+        business = Business.objects.create(owner=owner, name='Benchmark Business')
+        others = [Business(owner=owner, name=f'Neighbour {i}') for i in range(10)]
+        Business.objects.bulk_create(others)
+
+        links = {}
+        for b in [business, *others]:
+            links[b.pk] = ReviewLink.objects.create(business=b)
+
+        plan = [(business, options['reviews'])]
+        plan += [(b, options['other_reviews'] // len(others)) for b in others]
+
+        # auto_now_add would stamp every row with the same instant; keep the
+        # synthetic timestamps (one review a minute, newest now) instead
+        created_at = CustomerReview._meta.get_field('created_at')
+        created_at.auto_now_add = False
+        start = time.perf_counter()
+        now = timezone.now()
+        try:
+            for b, count in plan:
+                link = links[b.pk]
+                for offset in range(0, count, options['batch_size']):
+                    CustomerReview.objects.bulk_create(
+                        CustomerReview(
+                            business=b, review_link=link, rating=1 + i % 5,
+                            feedback='Great coffee and friendly staff', ai_review=None,
+                            created_at=now - timedelta(minutes=i),
+                        )
+                        for i in range(offset, min(offset + options['batch_size'], count))
+                    )
+        finally:
+            created_at.auto_now_add = True
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        total = options['reviews'] + options['other_reviews']
+        self.stdout.write(f'created {total:,} reviews in {time.perf_counter() - start:.1f} s')
+        return business
+
+    def report(self, business, options):
+        page_size = options['page_size']
+        reviews = CustomerReview.objects.filter(business=business)
+        ordered = reviews.order_by('-created_at', '-id')
+
+        self.stdout.write(f'{"depth":>10} {"keyset ms":>10} {"offset ms":>10}')
+        for fraction in DEPTHS:
+            depth = int(options['reviews'] * fraction)
+            cursor = None
+            if depth:
+                # Untimed: the cursor a reader would be holding after `depth` rows
+                cursor = encode_cursor(ordered[depth - 1])
+
+            keyset = self.median_ms(lambda: paginate_reviews(reviews, cursor, page_size), options['samples'])
+            offset = self.median_ms(lambda: list(ordered[depth:depth + page_size]), options['samples'])
+
+            page, _ = paginate_reviews(reviews, cursor, page_size)
+            assert [r.pk for r in page] == [r.pk for r in ordered[depth:depth + page_size]]
+            self.stdout.write(f'{depth:>10,} {keyset:>10.2f} {offset:>10.2f}')
+
+    def median_ms(self, fn, samples):
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,90 @@
+import json
+import os
+import platform
+import sys
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from businesses.benchmarks import BenchmarkError, compare, run_benchmarks
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the ai_service, QR and page hot paths, saves the results as JSON and '
+        'fails if any got slower (or made more queries) than the stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                            help='Results of an earlier run to compare with')
+        parser.add_argument('--update-baseline', '--save-baseline', action='store_true', dest='update_baseline',
+                            help='Store this run as the baseline instead of comparing')
+        parser.add_argument('--no-baseline', action='store_true',
+                            help='Just report timings, without comparing with a baseline')
+        parser.add_argument('--output', help='Also write this run to a JSON file')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed slowdown before a benchmark counts as a regression (0.25 = 25%%)')
+        parser.add_argument('--only', action='append',
+                            help='Run benchmarks whose name starts with this (repeatable), e.g. ai. or page.')
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiplies the calls per round; lower for a quick run')
+
+    def handle(self, *args, **options):
+        try:
+            results = run_benchmarks(options['only'], options['rounds'], options['scale'])
+        except BenchmarkError as e:
+            raise CommandError(e)
+
+        run = {
+            'created': timezone.now().isoformat(),
+            'python': sys.version.split()[0],
+            'django': django.get_version(),
+            'machine': platform.node(),
+            'benchmarks': results,
+        }
+        if options['output']:
+            self.write_json(options['output'], run)
+
+        if options['update_baseline']:
+            self.report(results, {})
+            self.write_json(options['baseline'], run)
+            self.stdout.write(f"baseline saved to {options['baseline']}")
+            return
+
+        if options['no_baseline']:
+            self.report(results, {})
+            return
+
+        if not os.path.exists(options['baseline']):
+            raise CommandError(
+                f"no baseline at {options['baseline']}; "
+                "create one with --update-baseline or skip the comparison with --no-baseline"
+            )
+        with open(options['baseline'], encoding='utf-8') as f:
+            baseline = json.load(f)['benchmarks']
+
+        regressions = self.report(results, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s): ' + '; '.join(regressions))
+
+    def report(self, results, baseline, tolerance=0.0):
+        rows, regressions = compare(results, baseline, tolerance)
+        for name, result, before, change in rows:
+            line = f"{name:<26} {result['seconds'] * 1_000_000:>11.1f} µs"
+            if result['queries'] is not None:
+                line += f"  {result['queries']:>3} queries"
+            if before is not None:
+                line += f"  (baseline {before['seconds'] * 1_000_000:.1f} µs, {change:+.0%})"
+            self.stdout.write(line)
+        return regressions
+
+    def write_json(self, path, run):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
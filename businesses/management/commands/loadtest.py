@@ -0,0 +1,148 @@
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from businesses.models import Business
+from users.models import User
+
+LOADTEST_BUSINESS = 'Load Test Cafe'
+FEEDBACK = [
+    '',
+    'Great coffee and the staff were friendly',
+    'Food took ages to arrive and came out cold',
+    'Nice terrace, decent pasta, a bit pricey',
+]
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list, p in 0-100."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def loadtest_token():
+    """Review link token of the load-test business (no link or per-business limits), created on first use."""
+    owner, _ = User.objects.get_or_create(username='loadtest')
+    business, _ = Business.objects.update_or_create(
+        owner=owner, name=LOADTEST_BUSINESS,
+        defaults={'google_review_url': 'https://example.com/review', 'ip_rate_limit': 0, 'link_rate_limit': 0},
+    )
+    return business.get_review_link().token
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives the customer review flow (open the form, submit, get the review) '
+        'against a running server and reports throughput and latency percentiles'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the running app')
+        parser.add_argument('--token', help='Review link token; defaults to a load-test business in this database')
+        parser.add_argument('--concurrency', type=int, default=10, help='Customers in flight at once')
+        parser.add_argument('--requests', type=int, default=100, help='Customers in total')
+        parser.add_argument('--stream', action='store_true', help='Use the streaming endpoint, like the browser')
+        parser.add_argument('--timeout', type=float, default=60)
+
+    def handle(self, *args, **options):
+        token = options['token'] or loadtest_token()
+        self.timings = {'form': [], 'review': [], 'first_token': []}
+        self.methods = Counter()
+        self.errors = Counter()
+
+        start = time.perf_counter()
+        asyncio.run(self.run(options['url'].rstrip('/'), token, options))
+        elapsed = time.perf_counter() - start
+
+        completed = len(self.timings['review'])
+        if not completed:
+            raise CommandError(f'no customer got a review; errors: {dict(self.errors)}')
+
+        self.stdout.write(
+            f"{completed} reviews in {elapsed:.1f} s at concurrency {options['concurrency']}: "
+            f"{completed / elapsed:.1f} reviews/sec"
+        )
+        for step, timings in self.timings.items():
+            if timings:
+                self.stdout.write(
+                    f'{step:>12}: p50 {percentile(timings, 50) * 1000:7.0f} ms  '
+                    f'p95 {percentile(timings, 95) * 1000:7.0f} ms  '
+                    f'p99 {percentile(timings, 99) * 1000:7.0f} ms'
+                )
+        self.stdout.write(f'generation methods: {dict(self.methods)}')
+        if self.errors:
+            self.stdout.write(self.style.WARNING(f'errors: {dict(self.errors)}'))
+
+    async def run(self, base_url, token, options):
+        remaining = iter(range(options['requests']))
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        async with httpx.AsyncClient(base_url=base_url, timeout=options['timeout'], limits=limits) as client:
+
+            async def customer_loop():
+                for _ in remaining:
+                    try:
+                        await self.customer(client, token, options['stream'])
+                    except httpx.HTTPStatusError as e:
+                        self.errors[f'HTTP {e.response.status_code}'] += 1
+                    except Exception as e:
+                        self.errors[f'{type(e).__name__}: {e}'[:80]] += 1
+
+            await asyncio.gather(*(customer_loop() for _ in range(options['concurrency'])))
+
+    async def customer(self, client, token, stream):
+        """One customer: load the form, then submit it and wait for the review."""
+        start = time.perf_counter()
+        form = await client.get(reverse('reviews:review_form', kwargs={'token': token}))
+        form.raise_for_status()
+        self.timings['form'].append(time.perf_counter() - start)
+
+        # Customers share the connection pool, so send each one's CSRF cookie explicitly
+        csrf_token = form.cookies.get('csrftoken', '')
+        data = {
+            f'{name}_rating': random.randint(1, 5) for name in ('food', 'service', 'atmosphere', 'recommend')
+        }
+        data['feedback'] = random.choice(FEEDBACK)
+        headers = {
+            'X-CSRFToken': csrf_token,
+            'Cookie': f'csrftoken={csrf_token}',
+            # Each customer gets its own address, as seen through one proxy (NUM_PROXIES=1)
+            'X-Forwarded-For': f'10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}',
+        }
+
+        start = time.perf_counter()
+        if stream:
+            url = reverse('reviews:stream_review', kwargs={'token': token})
+            result = await self.read_stream(client, url, data, headers, start)
+        else:
+            url = reverse('reviews:submit_review', kwargs={'token': token})
+            response = await client.post(url, data=data, headers=headers)
+            response.raise_for_status()
+            result = response.json()
+        elapsed = time.perf_counter() - start
+
+        if not result.get('success'):
+            raise RuntimeError(result.get('error', 'review failed'))
+        self.timings['review'].append(elapsed)
+        self.methods[result['generation_method']] += 1
+
+    async def read_stream(self, client, url, data, headers, start):
+        """Read the server-sent events until done, recording time to the first token."""
+        event, first_token = None, None
+        async with client.stream('POST', url, data=data, headers=headers) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith('event: '):
+                    event = line[7:]
+                    if event == 'token' and first_token is None:
+                        first_token = time.perf_counter() - start
+                        self.timings['first_token'].append(first_token)
+                elif line.startswith('data: ') and event in ('done', 'error'):
+                    return json.loads(line[6:])
+        raise RuntimeError('stream ended without a review')
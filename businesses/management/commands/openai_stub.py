@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from businesses.openai_stub import StubOpenAIServer, parse_latency
+
+
+class Command(BaseCommand):
+    help = 'Runs a local OpenAI-compatible chat completions server for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--latency', default='lognormal:0.8,0.5',
+                            help='Delay before each answer: none, fixed:S, uniform:MIN,MAX or lognormal:MEDIAN,SIGMA')
+        parser.add_argument('--chunk-delay', type=float, default=0.02,
+                            help='Seconds between streamed chunks')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Share of completions answered with --error-status')
+        parser.add_argument('--error-status', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            latency = parse_latency(options['latency'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        server = StubOpenAIServer(
+            options['host'], options['port'],
+            latency=latency,
+            chunk_delay=options['chunk_delay'],
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+        )
+        self.stdout.write(
+            f"OpenAI stub on {server.base_url} (latency {options['latency']}, "
+            f"{options['error_rate']:.0%} errors); run the app with OPENAI_BASE_URL={server.base_url}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'{server.requests} requests on {server.connections} connections')
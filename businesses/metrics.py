@@ -0,0 +1,110 @@
+"""
+Prometheus metrics for review generation and request latency.
+
+Each gunicorn worker records into its own files under
+PROMETHEUS_MULTIPROC_DIR (set up by gunicorn.conf.py), and /metrics sums
+them, so a scrape sees the whole server whichever worker answers it.
+Without that variable (runserver, tests) the metrics stay in-process.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+# Model calls take seconds, everything else milliseconds
+STAGE_BUCKETS = (.001, .005, .01, .025, .05, .1, .25, .5, 1, 2, 4, 8, 16, 32)
+
+REVIEW_STAGE_SECONDS = Histogram(
+    'reviewbud_review_stage_seconds',
+    'Time spent in each stage of producing a review',
+    ['stage'],  # prompt, openai, humanize, db_insert
+    buckets=STAGE_BUCKETS,
+)
+OPENAI_TOKENS = Counter(
+    'reviewbud_openai_tokens',
+    'Tokens used by review generation',
+    ['kind'],  # prompt, cached_prompt, completion
+)
+REVIEW_GENERATIONS = Counter(
+    'reviewbud_review_generations',
+    'Reviews handed to customers, by generation method',
+    ['method'],
+)
+REVIEW_FALLBACKS = Counter(
+    'reviewbud_review_fallbacks',
+    'Reviews that fell back to a template, by the exception that caused it',
+    ['exception'],
+)
+REQUEST_SECONDS = Histogram(
+    'reviewbud_request_seconds',
+    'Time until the response starts, by view',
+    ['view', 'method', 'status'],
+    buckets=STAGE_BUCKETS,
+)
+
+
+@contextmanager
+def time_stage(stage):
+    """Time the body of the with block as `stage` of review generation."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REVIEW_STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def count_fallback(error):
+    REVIEW_FALLBACKS.labels(type(error).__name__).inc()
+
+
+def render_metrics():
+    """
+    Returns:
+        (body, content_type) in the Prometheus text format
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _observe_request(request, response, start):
+    match = request.resolver_match
+    REQUEST_SECONDS.labels(
+        match.view_name if match else 'unmatched', request.method, response.status_code,
+    ).observe(time.perf_counter() - start)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records per-view request latency. Works in sync and async stacks so the
+    async review views aren't forced through a thread. Streaming responses
+    are timed to their first byte, not to the end of the stream.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        _observe_request(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        _observe_request(request, response, start)
+        return response
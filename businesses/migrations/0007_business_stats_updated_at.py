@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:56
+
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def mark_existing_stats_fetched(apps, schema_editor):
+    # Businesses that already have numbers shouldn't show as pending
+    Business = apps.get_model('businesses', 'Business')
+    Business.objects.filter(
+        Q(rating__isnull=False) | Q(total_reviews__isnull=False)
+    ).update(stats_updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0006_business_place_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='stats_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_stats_fetched, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0007_business_stats_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyReviewStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('submissions', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='businesses.business')),
+            ],
+            options={
+                'verbose_name_plural': 'daily review stats',
+                'constraints': [models.UniqueConstraint(fields=('business', 'date'), name='unique_daily_stats_per_business')],
+            },
+        ),
+    ]
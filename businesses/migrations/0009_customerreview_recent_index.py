@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0008_dailyreviewstats'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='customerreview',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='customerreview',
+            index=models.Index(fields=['business', '-created_at', '-id'], name='review_business_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0010_business_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PregeneratedReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.IntegerField(choices=[(1, '1 Star'), (2, '2 Stars'), (3, '3 Stars'), (4, '4 Stars'), (5, '5 Stars')])),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pregenerated_reviews', to='businesses.business')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business', 'rating', 'created_at'], name='pregenerated_review_pool_idx')],
+            },
+        ),
+    ]
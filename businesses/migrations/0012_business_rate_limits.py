@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0011_pregeneratedreview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='ip_rate_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Reviews per minute from one customer', null=True),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='link_rate_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Reviews per minute in total', null=True),
+        ),
+    ]
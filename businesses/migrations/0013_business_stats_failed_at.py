@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0012_business_rate_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='stats_failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 import uuid
 from django.urls import reverse
 from users.models import User
@@ -9,14 +10,27 @@ class Business(models.Model):
     address = models.TextField()
     google_review_url = models.URLField(help_text="Direct link to Google Reviews page")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True) # last edit, used for API Last-Modified/ETag
     is_active = models.BooleanField(default=True)
 
     place_id = models.CharField(max_length=255, blank=True, null=True)
     rating = models.FloatField(null=True, blank=True)
     total_reviews = models.IntegerField(null=True, blank=True)
+    stats_updated_at = models.DateTimeField(null=True, blank=True) # last successful Google Places fetch
+    stats_failed_at = models.DateTimeField(null=True, blank=True) # last fetch that ran out of retries
+
+    # Review submissions per minute (see reviews/ratelimit.py). The IP limit applies on top of the
+    # site-wide one, blank or 0 for none; the link limit replaces the default, blank for it, 0 for no limit
+    ip_rate_limit = models.PositiveIntegerField(null=True, blank=True, help_text="Reviews per minute from one customer")
+    link_rate_limit = models.PositiveIntegerField(null=True, blank=True, help_text="Reviews per minute in total")
 
     def __str__(self):
         return self.name
+
+    @property
+    def stats_pending(self):
+        """True until the background Google Places fetch has filled in rating/total_reviews or given up."""
+        return bool(self.place_id) and self.stats_updated_at is None and self.stats_failed_at is None
     
     def get_review_link(self):
         """Get or create the review link for this business
@@ -50,8 +64,29 @@ class ReviewLink(models.Model):
     # this function triggers urls.py /review/ and returns something like "/review/abc123-def456-ghi789/"
     
     def increment_clicks(self):
+        # Atomic in the database; the review form uses the buffered counter in businesses/clicks.py
+        ReviewLink.objects.filter(pk=self.pk).update(click_count=F('click_count') + 1)
         self.click_count += 1
-        self.save()
+
+def ensure_review_links(businesses):
+    """
+    Give every business a review link, creating the missing ones with a single bulk_create.
+
+    Expects businesses loaded with select_related('review_link') so that
+    finding the missing links doesn't cost a query per business.
+
+    Returns:
+        list: the businesses, each with review_link populated
+    """
+    businesses = list(businesses)
+    missing = [business for business in businesses if not hasattr(business, 'review_link')]
+    if missing:
+        links = ReviewLink.objects.bulk_create(
+            [ReviewLink(business=business, token=uuid.uuid4()) for business in missing]
+        )
+        for business, link in zip(missing, links):
+            business.review_link = link
+    return businesses
 
 class CustomerReview(models.Model):
     """Individual review submitted by a customer"""
@@ -78,4 +113,58 @@ class CustomerReview(models.Model):
         return f"{self.rating}★ review for {self.business.name}"
     
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        # No default ordering: every listing sorts explicitly by
+        # (created_at, id) and walks this index with a keyset cursor
+        # (see businesses/pagination.py).
+        indexes = [
+            models.Index(
+                fields=['business', '-created_at', '-id'],
+                name='review_business_recent_idx',
+            ),
+        ]
+
+class DailyReviewStats(models.Model):
+    """
+    Per-business, per-day rollup of review activity for the analytics page.
+    Kept up to date incrementally by businesses/rollups.py as reviews and
+    clicks arrive; rebuild with `manage.py backfill_rollups`.
+    """
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+
+    clicks = models.PositiveIntegerField(default=0) # review link opens (QR scans)
+    submissions = models.PositiveIntegerField(default=0) # reviews generated
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.business.name} on {self.date}"
+
+    class Meta:
+        verbose_name_plural = "daily review stats"
+        constraints = [
+            models.UniqueConstraint(fields=['business', 'date'], name='unique_daily_stats_per_business'),
+        ]
+
+class PregeneratedReview(models.Model):
+    """
+    A humanized draft written ahead of time for customers who leave little
+    or no feedback, so they get a review instantly instead of waiting on
+    OpenAI. Each row is handed out once; see businesses/review_pool.py.
+    """
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='pregenerated_reviews')
+    rating = models.IntegerField(choices=CustomerReview.RATING_CHOICES)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Pre-generated {self.rating}★ review for {self.business.name}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['business', 'rating', 'created_at'], name='pregenerated_review_pool_idx'),
+        ]
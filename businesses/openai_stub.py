@@ -0,0 +1,172 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Speaks enough of the protocol for the openai client: POST
+/v1/chat/completions (plain or streamed, with `n` choices and token usage)
+and GET /v1/models (the warm-up call). Latency, per-chunk streaming delay
+and error injection are configurable, so the review flow can be load
+tested without spending OpenAI credits:
+
+    python manage.py openai_stub --latency lognormal:0.8,0.5 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub gunicorn ...
+    python manage.py loadtest --concurrency 50 --requests 2000
+
+The test suite runs it in-process on a random port.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_REVIEW = "Solid spot, good food {number}."
+
+
+def parse_latency(spec):
+    """
+    Turn a latency spec into a function returning one delay in seconds.
+
+        0 / none                 no delay
+        fixed:0.8                always 0.8 s
+        uniform:0.5,2            anywhere between 0.5 and 2 s
+        lognormal:0.8,0.5        median 0.8 s, sigma 0.5 (a long right tail, like the real API)
+
+    Raises:
+        ValueError: the spec isn't one of the above
+    """
+    kind, _, args = spec.partition(':')
+    try:
+        params = [float(arg) for arg in args.split(',')] if args else []
+    except ValueError:
+        raise ValueError(f"Bad latency parameters in {spec!r}")
+
+    if kind in ('0', 'none') and not params:
+        return lambda: 0.0
+    if kind == 'fixed' and len(params) == 1:
+        return lambda: params[0]
+    if kind == 'uniform' and len(params) == 2:
+        return lambda: random.uniform(*params)
+    if kind == 'lognormal' and len(params) == 2:
+        median, sigma = params
+        return lambda: median * random.lognormvariate(0, sigma)
+    raise ValueError(f"Unknown latency spec {spec!r}, expected none, fixed:S, uniform:MIN,MAX or lognormal:MEDIAN,SIGMA")
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """
+    Answers every chat completion with `n` canned reviews ("Solid spot,
+    good food 1.", ...) after a delay drawn from the server's `latency`,
+    or with its `error_status` for a share `error_rate` of requests.
+    """
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self.send_json(200, {'object': 'list', 'data': [{'id': 'gpt-4o', 'object': 'model', 'owned_by': 'stub'}]})
+        else:
+            self.send_json(404, {'error': {'message': 'not found', 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        server = self.server
+        server.count_request()
+        time.sleep(server.latency())
+
+        if server.error_rate and random.random() < server.error_rate:
+            self.send_json(server.error_status, {'error': {'message': 'injected', 'type': 'server_error'}})
+            return
+
+        texts = [STUB_REVIEW.format(number=i + 1) for i in range(request.get('n') or 1)]
+        usage = {
+            'prompt_tokens': sum(len(m.get('content') or '') for m in request.get('messages', [])) // 4,
+            'completion_tokens': sum(len(text.split()) for text in texts),
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+
+        if request.get('stream'):
+            include_usage = (request.get('stream_options') or {}).get('include_usage')
+            self.send_stream(texts, usage if include_usage else None)
+            return
+        self.send_json(200, {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4o'),
+            'choices': [{
+                'index': i,
+                'finish_reason': 'stop',
+                'message': {'role': 'assistant', 'content': text},
+            } for i, text in enumerate(texts)],
+            'usage': usage,
+        })
+
+    def send_stream(self, texts, usage):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        chunk = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': 'gpt-4o'}
+        for i, text in enumerate(texts):
+            for word in text.split(' '):
+                choice = {'index': i, 'delta': {'content': word + ' '}, 'finish_reason': None}
+                self.send_event({**chunk, 'choices': [choice]})
+                time.sleep(self.server.chunk_delay)
+        if usage:
+            self.send_event({**chunk, 'choices': [], 'usage': usage})
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.close_connection = True
+
+    def send_event(self, data):
+        self.wfile.write(f'data: {json.dumps(data)}\n\n'.encode())
+        self.wfile.flush()
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubOpenAIServer(ThreadingHTTPServer):
+    """Stub server that also counts the requests and TCP connections it gets."""
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=None, chunk_delay=0.0, error_rate=0.0, error_status=500):
+        """
+        Args:
+            host (str), port (int): where to listen; port 0 picks a free one
+            latency: function returning the delay before each answer, see parse_latency
+            chunk_delay (float): seconds between streamed chunks
+            error_rate (float): share of completions answered with `error_status`
+            error_status (int): HTTP status of injected errors
+        """
+        super().__init__((host, port), StubOpenAIHandler)
+        self.latency = latency or parse_latency('none')
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.connections = 0
+        self.requests = 0
+        self._count_lock = threading.Lock()
+
+    def count_request(self):
+        with self._count_lock:
+            self.requests += 1
+
+    def handle_error(self, request, client_address):
+        pass  # clients that gave up on a delayed answer
+
+    def process_request(self, request, client_address):
+        with self._count_lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
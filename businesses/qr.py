@@ -0,0 +1,72 @@
+"""
+QR code rendering with an in-process LRU cache.
+
+A review link's QR code only depends on the URL it encodes, the box size and
+the output format, so each combination is rendered once per worker and then
+served from memory. The ETag is derived from the same key, which lets the
+view answer conditional requests without rendering anything.
+"""
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.urls import reverse
+
+QR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+DEFAULT_BOX_SIZE = 10
+MAX_BOX_SIZE = 40
+QR_CACHE_SIZE = 1024
+
+# Bump when the rendering below changes. Responses are cached as immutable,
+# so it goes in the QR image URLs (qr_code_url) as well as the ETag: a new
+# version is a new URL, which clients haven't cached yet.
+QR_RENDER_VERSION = 1
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def render_qr_code(data, fmt='png', box_size=DEFAULT_BOX_SIZE):
+    """
+    Render a QR code for data.
+
+    Args:
+        data (str): text to encode, usually the absolute review URL
+        fmt (str): 'png' or 'svg'
+        box_size (int): pixels per module (PNG) or size unit (SVG)
+
+    Returns:
+        bytes: the encoded image
+    """
+    qr = qrcode.QRCode(version=1, box_size=box_size, border=5)
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    buffer = BytesIO()
+    if fmt == 'svg':
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathFillImage)
+        img.save(buffer)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def qr_code_url(review_link):
+    """Path of the review link's QR image for the current rendering version."""
+    return f"{reverse('businesses:qr_code', kwargs={'token': review_link.token})}?v={QR_RENDER_VERSION}"
+
+
+def qr_etag(data, fmt='png', box_size=DEFAULT_BOX_SIZE):
+    """Strong ETag for a rendered QR code, computed without rendering it."""
+    key = f"{QR_RENDER_VERSION}|{fmt}|{box_size}|{data}"
+    return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+
+def warm_qr_cache(data):
+    """Pre-render the default PNG and SVG so the first scan page load is instant."""
+    for fmt in QR_CONTENT_TYPES:
+        render_qr_code(data, fmt, DEFAULT_BOX_SIZE)
@@ -0,0 +1,112 @@
+"""
+Pool of pre-generated reviews.
+
+When a customer leaves no tags and little or no feedback, the prompt
+depends only on the business name and the star rating, so the review can
+be written before they ask for it. Background tasks (businesses/tasks.py)
+keep REVIEW_POOL_DEPTH humanized drafts per business and rating; the
+review views hand one out instantly and fall back to a live OpenAI call
+when the pool is empty or the customer had something specific to say.
+"""
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from businesses.ai_service import generate_review_with_ai, is_minimal_feedback
+from businesses.models import Business, PregeneratedReview
+
+logger = logging.getLogger(__name__)
+
+POOL_METHOD = "ChatGPT API (pre-generated)"
+CLAIM_ATTEMPTS = 3  # concurrent claims can race for the same draft
+
+
+def pool_enabled():
+    return settings.REVIEW_POOL_DEPTH > 0 and bool(settings.OPENAI_API_KEY)
+
+
+def uses_pool(feedback, tags):
+    """True when the review would depend only on the business and rating."""
+    return is_minimal_feedback(feedback) and not (tags or '').strip()
+
+
+def draft_cutoff():
+    """Drafts older than this are no longer handed out, and dropped on the next top-up."""
+    return timezone.now() - timedelta(seconds=settings.REVIEW_POOL_MAX_AGE)
+
+
+def fresh_drafts():
+    return PregeneratedReview.objects.filter(created_at__gte=draft_cutoff())
+
+
+def count_fresh_drafts(business_ids):
+    """
+    Returns:
+        dict: (business_id, rating) -> number of fresh drafts
+    """
+    rows = (
+        fresh_drafts().filter(business_id__in=business_ids)
+        .values_list('business_id', 'rating')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    return {(business_id, rating): count for business_id, rating, count in rows}
+
+
+def claim_review(business_id, rating):
+    """
+    Take one draft out of the pool.
+
+    Deleting the row is the claim: if two requests pick the same draft only
+    one delete succeeds, and the other tries the next draft.
+
+    Returns:
+        str: the review text, or None when the pool is empty
+    """
+    drafts = (
+        fresh_drafts().filter(business_id=business_id, rating=rating)
+        .order_by('created_at')
+        .only('id', 'text')
+    )
+    for _ in range(CLAIM_ATTEMPTS):
+        draft = drafts.first()
+        if draft is None:
+            return None
+        deleted, _ = PregeneratedReview.objects.filter(pk=draft.pk).delete()
+        if deleted:
+            return draft.text
+    return None
+
+
+aclaim_review = sync_to_async(claim_review)
+
+
+def fill_review_pool(business_id, rating):
+    """
+    Generate drafts until the business has REVIEW_POOL_DEPTH fresh ones for `rating`.
+
+    Returns:
+        int: number of drafts added
+    """
+    business = Business.objects.filter(pk=business_id, is_active=True).only('id', 'name').first()
+    if business is None:
+        return 0
+
+    pool = PregeneratedReview.objects.filter(business_id=business_id, rating=rating)
+    pool.filter(created_at__lt=draft_cutoff()).delete()
+
+    drafts = []
+    for _ in range(settings.REVIEW_POOL_DEPTH - pool.count()):
+        text, method, _ = generate_review_with_ai({'overall': rating}, "", business.name)
+        if method != "ChatGPT API":
+            # OpenAI is failing; a live request will retry it, don't stock local reviews
+            break
+        drafts.append(PregeneratedReview(business=business, rating=rating, text=text))
+
+    PregeneratedReview.objects.bulk_create(drafts)
+    logger.info(f"Added {len(drafts)} pre-generated {rating}-star reviews for business {business_id}")
+    return len(drafts)
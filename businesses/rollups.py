@@ -0,0 +1,106 @@
+"""
+Incremental per-day analytics rollups (DailyReviewStats).
+
+Every review submission and click flush adds to the row for its business
+and day with F() updates, so the analytics page can read a handful of
+rows per business instead of aggregating the whole reviews table.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from businesses.models import DailyReviewStats, ReviewLink
+
+RATING_FIELDS = {rating: f'rating_{rating}' for rating in range(1, 6)}
+REVIEW_FIELDS = ['submissions', 'rating_sum', *RATING_FIELDS.values()]
+
+
+def add_to_daily_stats(business_id, day, **increments):
+    """Add `increments` to the business's row for `day`, creating it if needed."""
+    updates = {field: F(field) + amount for field, amount in increments.items()}
+    rows = DailyReviewStats.objects.filter(business_id=business_id, date=day)
+    if rows.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailyReviewStats.objects.create(business_id=business_id, date=day, **increments)
+    except IntegrityError:
+        # Another request created the row first
+        rows.update(**updates)
+
+
+def record_review(business_id, rating, when=None):
+    """Count one submitted review."""
+    day = timezone.localdate(when)
+    increments = {'submissions': 1, 'rating_sum': rating}
+    if rating in RATING_FIELDS:
+        increments[RATING_FIELDS[rating]] = 1
+    add_to_daily_stats(business_id, day, **increments)
+
+
+def record_clicks(clicks_by_link, when=None):
+    """
+    Count clicks flushed from the click buffer.
+
+    Args:
+        clicks_by_link (dict): review_link_id -> number of clicks
+    """
+    day = timezone.localdate(when)
+    business_ids = dict(
+        ReviewLink.objects.filter(pk__in=clicks_by_link).values_list('pk', 'business_id')
+    )
+    clicks_by_business = {}
+    for link_id, count in clicks_by_link.items():
+        if link_id in business_ids:
+            business_id = business_ids[link_id]
+            clicks_by_business[business_id] = clicks_by_business.get(business_id, 0) + count
+
+    for business_id, count in sorted(clicks_by_business.items()):
+        add_to_daily_stats(business_id, day, clicks=count)
+
+
+def summarize_daily_stats(business, days=365):
+    """
+    Analytics for the last `days` days, read from the rollups only.
+
+    Returns:
+        dict: totals for the last 30 days, a rating histogram and one
+        {date, submissions, clicks} entry per day (oldest first)
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rows = {
+        row.date: row
+        for row in DailyReviewStats.objects.filter(business=business, date__gte=start)
+    }
+
+    series = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = rows.get(day)
+        series.append({
+            'date': day.isoformat(),
+            'submissions': row.submissions if row else 0,
+            'clicks': row.clicks if row else 0,
+        })
+
+    recent = [row for day, row in rows.items() if day > today - timedelta(days=30)]
+    submissions = sum(row.submissions for row in recent)
+    clicks = sum(row.clicks for row in recent)
+    rating_sum = sum(row.rating_sum for row in recent)
+
+    histogram = {
+        rating: sum(getattr(row, field) for row in rows.values())
+        for rating, field in RATING_FIELDS.items()
+    }
+
+    return {
+        'submissions': submissions,
+        'clicks': clicks,
+        'average_rating': round(rating_sum / submissions, 1) if submissions else None,
+        'conversion': round(100 * submissions / clicks) if clicks else None,
+        'histogram': histogram,
+        'series': series,
+    }
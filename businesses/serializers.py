@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
 from .models import Business, ReviewLink, CustomerReview
 
@@ -6,7 +8,43 @@ DJANGO SERIALIZER: is a data translator between complex types
 (like models) and python native or JSON formats.
 '''
 
-class BusinessSerializer(serializers.ModelSerializer):
+def review_url_prefix(context):
+    """
+    Absolute URL of the review form without the token, e.g.
+    "https://reviewbud.co/reviews/review/". Worked out once per request and
+    kept in the serializer context, which list serializers share.
+    """
+    prefix = context.get('review_url_prefix')
+    if prefix is None:
+        request = context.get('request')
+        base = request.build_absolute_uri('/')[:-1] if request else settings.SITE_URL
+        path = reverse('reviews:review_form', kwargs={'token': 'TOKEN'})
+        prefix = base + path[:path.index('TOKEN')]
+        context['review_url_prefix'] = prefix
+    return prefix
+
+
+class SparseFieldsMixin:
+    """
+    Lets API clients ask for a subset of fields with ?fields=id,name.
+    Unknown names are ignored; without the parameter every field is returned.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = request.GET.get('fields') if request else None
+        if requested:
+            keep = {name.strip() for name in requested.split(',')}
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
+
+class BusinessSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Read-only about review links: it never creates one. To list businesses
+    in constant queries, load them with select_related('review_link') and
+    pass them through models.ensure_review_links() first.
+    """
     review_link = serializers.SerializerMethodField()
     
     class Meta:
@@ -15,11 +53,14 @@ class BusinessSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
     def get_review_link(self, obj):
-        link = obj.get_review_link()
-        return f"https://reviewbud.co/review/{link.token}"
+        try:
+            link = obj.review_link
+        except ReviewLink.DoesNotExist:
+            return None
+        return f"{review_url_prefix(self.context)}{link.token}/"
     
 
-class ReviewLinkSerializer(serializers.ModelSerializer):
+class ReviewLinkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     business_name = serializers.CharField(source='business.name', read_only=True)
     review_link = serializers.SerializerMethodField()
 
@@ -28,9 +69,9 @@ class ReviewLinkSerializer(serializers.ModelSerializer):
         fields = ['id', 'business_name', 'token', 'click_count', 'review_link']
 
     def get_review_link(self, obj):
-        return f"https://reviewbud.co/review/{obj.token}"
+        return f"{review_url_prefix(self.context)}{obj.token}/"
     
-class CustomerReviewSerializer(serializers.ModelSerializer):
+class CustomerReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     business_name = serializers.CharField(source='business.name', read_only=True)
 
     class Meta:
@@ -1,20 +1,109 @@
+import threading
+import time
+
 import requests
 from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+PLACES_URL = "https://places.googleapis.com/v1/places/{place_id}"
+PLACES_CACHE_KEY = "places:stats:{place_id}"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class PlacesAPIError(Exception):
+    """The Places API call failed in a way that may succeed if retried."""
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls out to at most `qps` per second."""
+
+    def __init__(self, qps):
+        self.interval = 1.0 / qps if qps > 0 else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def get_places_session():
+    """
+    Shared requests session for the Places API.
+
+    Keeps a pool of keep-alive connections to places.googleapis.com and
+    retries idempotent GETs on connection errors, 429s and 5xx with backoff.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=settings.PLACES_MAX_RETRIES,
+                    backoff_factor=settings.PLACES_RETRY_BACKOFF,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(["GET"]),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=settings.PLACES_POOL_SIZE,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.headers["X-Goog-FieldMask"] = "rating,userRatingCount"
+                _session = session
+    return _session
+
+
+def request_google_stats_for_place(place_id: str, use_cache=True):
+    """
+    Returns (rating, user_rating_count).
+
+    Successful lookups are cached for PLACES_STATS_CACHE_TTL seconds, so
+    repeated lookups of the same place don't hit the API again.
+
+    Raises PlacesAPIError for network errors, 429s and 5xx responses so
+    callers can retry. Other errors (e.g. an unknown place) give (None, None).
+    """
+    cache_key = PLACES_CACHE_KEY.format(place_id=place_id)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    headers = {"X-Goog-Api-Key": settings.GOOGLE_PLACES_SERVER_API_KEY}
+    timeout = (settings.PLACES_CONNECT_TIMEOUT, settings.PLACES_READ_TIMEOUT)
+    try:
+        resp = get_places_session().get(PLACES_URL.format(place_id=place_id), headers=headers, timeout=timeout)
+    except requests.RequestException as e:
+        raise PlacesAPIError(str(e)) from e
+
+    if resp.status_code == 429 or resp.status_code >= 500:
+        raise PlacesAPIError(f"Places API returned {resp.status_code}")
+    if resp.status_code != 200:
+        return None, None
+    data = resp.json() or {}
+    stats = data.get("rating"), data.get("userRatingCount")
+
+    cache.set(cache_key, stats, settings.PLACES_STATS_CACHE_TTL)
+    return stats
+
 
 def fetch_google_stats_for_place(place_id: str):
     """Returns (rating, user_rating_count) or (None, None) on failure."""
     if not place_id:
         return None, None
-    headers = {
-        "X-Goog-Api-Key": settings.GOOGLE_PLACES_SERVER_API_KEY,
-        "X-Goog-FieldMask": "rating,userRatingCount",
-    }
-    url = f"https://places.googleapis.com/v1/places/{place_id}"
     try:
-        resp = requests.get(url, headers=headers, timeout=6)
-        if resp.status_code != 200:
-            return None, None
-        data = resp.json() or {}
-        return data.get("rating"), data.get("userRatingCount")
+        return request_google_stats_for_place(place_id)
     except Exception:
         return None, None
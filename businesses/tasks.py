@@ -1,3 +1,266 @@
-def update_google_stats_for_one_business(*args, **kwargs):
-    # TODO: Implement this Celery task
-    pass
\ No newline at end of file
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from businesses.models import Business, DailyReviewStats
+from businesses.review_pool import count_fresh_drafts, fill_review_pool, pool_enabled
+from businesses.rollups import RATING_FIELDS
+from businesses.services import PlacesAPIError, RateLimiter, request_google_stats_for_place
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_TICK = 60  # seconds between checks for due periodic tasks without a broker
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(PlacesAPIError,),
+    retry_backoff=True,  # 1s, 2s, 4s, ... between attempts
+    retry_backoff_max=600,
+    retry_jitter=True,
+    max_retries=5,
+)
+def update_google_stats_for_one_business(self, business_id):
+    """Fetch rating/total_reviews from Google Places for one business."""
+    business = Business.objects.filter(pk=business_id).only('id', 'place_id').first()
+    if business is None or not business.place_id:
+        return
+
+    try:
+        rating, count = request_google_stats_for_place(business.place_id)
+    except PlacesAPIError:
+        if self.request.retries >= self.max_retries:
+            # Giving up: stop the dashboard polling, the periodic sweep will try again
+            Business.objects.filter(pk=business_id).update(stats_failed_at=timezone.now())
+        raise
+    Business.objects.filter(pk=business_id).update(
+        rating=rating, total_reviews=count, stats_updated_at=timezone.now()
+    )
+
+
+_background_pool = None  # runs tasks when there is no broker
+_background_lock = threading.Lock()
+
+
+def _run_task(task, args):
+    try:
+        task.apply(args=args)
+    finally:
+        # Pool threads live on; don't let their connections outlive CONN_MAX_AGE
+        close_old_connections()
+
+
+def run_in_background(task, *args):
+    """Queue `task`, or run it on a small thread pool when no broker is configured."""
+    global _background_pool
+    if not settings.CELERY_TASK_ALWAYS_EAGER:
+        return task.delay(*args)
+    if _background_pool is None:
+        with _background_lock:
+            if _background_pool is None:
+                _background_pool = ThreadPoolExecutor(
+                    max_workers=settings.BACKGROUND_TASK_THREADS, thread_name_prefix="background-task",
+                )
+    return _background_pool.submit(_run_task, task, args)
+
+
+def start_schedule_without_broker():
+    """
+    With no broker there is no beat to run CELERY_BEAT_SCHEDULE, so each web
+    worker runs it on a thread instead, starting at boot (which also fills
+    in stats still pending from before the background fetch existed). A
+    cache key per entry keeps workers sharing a cache from running the same
+    sweep twice in one interval.
+    """
+    if settings.CELERY_TASK_ALWAYS_EAGER:
+        threading.Thread(target=_run_schedule, name="task-schedule", daemon=True).start()
+
+
+def run_due_tasks():
+    """
+    Run each CELERY_BEAT_SCHEDULE entry not already run within its interval.
+
+    Returns:
+        list: names of the entries that ran
+    """
+    ran = []
+    for name, entry in settings.CELERY_BEAT_SCHEDULE.items():
+        if cache.add(f"tasks:schedule:{name}", True, entry['schedule']):
+            _run_task(import_string(entry['task']), ())
+            ran.append(name)
+    return ran
+
+
+def _run_schedule():
+    while True:
+        try:
+            run_due_tasks()
+        except Exception as e:
+            logger.error(f"Periodic tasks failed: {e}")
+        time.sleep(SCHEDULE_TICK)
+
+
+def queue_google_stats_refresh(business_id):
+    """
+    Fetch a business's Google stats in the background once the current
+    transaction commits, so the caller never waits on the Places API.
+    """
+    transaction.on_commit(lambda: run_in_background(update_google_stats_for_one_business, business_id))
+
+
+@shared_task
+def refresh_google_stats():
+    """
+    Periodic sweep refreshing rating/total_reviews for every active business.
+
+    Businesses are processed in chunks of PLACES_REFRESH_CHUNK_SIZE. Each
+    chunk is fetched by PLACES_REFRESH_CONCURRENCY threads sharing a
+    PLACES_QPS budget, then written with a single bulk_update. Businesses
+    whose fetch fails go into the next chunk, through the same limiter,
+    until they have had PLACES_REFRESH_ATTEMPTS tries; the rest wait for
+    the next sweep.
+
+    Returns:
+        int: number of businesses whose stats changed
+    """
+    limiter = RateLimiter(settings.PLACES_QPS)
+    chunk_size = settings.PLACES_REFRESH_CHUNK_SIZE
+    businesses = (
+        Business.objects.filter(is_active=True)
+        .exclude(place_id__isnull=True)
+        .exclude(place_id='')
+        .only('id', 'place_id', 'rating', 'total_reviews', 'stats_updated_at')
+        .order_by('pk')
+    )
+
+    updated = 0
+    attempts = Counter()
+    retry = []  # failed fetches, tried again in the next chunk
+
+    def refresh(chunk):
+        nonlocal updated, retry
+        if not chunk:
+            return
+        changed, failed = _refresh_chunk(chunk, limiter)
+        updated += changed
+        attempts.update(business.id for business in failed)
+        retry = [business for business in failed if attempts[business.id] < settings.PLACES_REFRESH_ATTEMPTS]
+        gave_up = len(failed) - len(retry)
+        if gave_up:
+            logger.warning(f"Gave up on Google stats for {gave_up} businesses until the next sweep")
+
+    chunk = []
+    for business in businesses.iterator(chunk_size=chunk_size):
+        chunk.append(business)
+        if len(chunk) >= chunk_size:
+            refresh(retry + chunk)
+            chunk = []
+    refresh(retry + chunk)
+    while retry:
+        refresh(retry)
+
+    logger.info(f"Refreshed Google stats, {updated} businesses changed")
+    return updated
+
+
+def _refresh_chunk(businesses, limiter):
+    def fetch(business):
+        limiter.acquire()
+        try:
+            return request_google_stats_for_place(business.place_id)
+        except PlacesAPIError as e:
+            logger.warning(f"Places fetch failed for business {business.id}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=settings.PLACES_REFRESH_CONCURRENCY) as pool:
+        results = list(pool.map(fetch, businesses))
+
+    now = timezone.now()
+    fetched = []
+    failed = []
+    changed = 0
+    for business, stats in zip(businesses, results):
+        if stats is None:
+            failed.append(business)
+            continue
+        if stats != (business.rating, business.total_reviews):
+            business.rating, business.total_reviews = stats
+            changed += 1
+        business.stats_updated_at = now
+        fetched.append(business)
+
+    Business.objects.bulk_update(fetched, ['rating', 'total_reviews', 'stats_updated_at'])
+    return changed, failed
+
+
+def _pool_top_up_key(business_id, rating):
+    return f"review-pool:top-up:{business_id}:{rating}"
+
+
+@shared_task
+def top_up_review_pool(business_id, rating):
+    """Refill one business's pool of pre-generated reviews for one rating."""
+    try:
+        return fill_review_pool(business_id, rating)
+    finally:
+        cache.delete(_pool_top_up_key(business_id, rating))
+
+
+def queue_review_pool_top_up(business_id, rating):
+    """Refill a pool in the background, unless a refill for it is already queued."""
+    if not pool_enabled():
+        return
+    if cache.add(_pool_top_up_key(business_id, rating), True, settings.REVIEW_POOL_TOP_UP_TIMEOUT):
+        run_in_background(top_up_review_pool, business_id, rating)
+
+
+@shared_task
+def top_up_review_pools():
+    """
+    Periodic refill of the pre-generated review pools.
+
+    Only ratings a business actually received in the last
+    REVIEW_POOL_ACTIVE_DAYS are kept stocked, so idle businesses and
+    ratings nobody gives don't cost OpenAI calls.
+
+    Returns:
+        int: number of pools queued for a top-up
+    """
+    if not pool_enabled():
+        return 0
+
+    since = timezone.localdate() - timedelta(days=settings.REVIEW_POOL_ACTIVE_DAYS)
+    received = (
+        DailyReviewStats.objects.filter(date__gte=since, business__is_active=True)
+        .values('business_id')
+        .annotate(**{field: Sum(field) for field in RATING_FIELDS.values()})
+    )
+    wanted = [
+        (row['business_id'], rating)
+        for row in received
+        for rating, field in RATING_FIELDS.items()
+        if row[field]
+    ]
+
+    stocked = count_fresh_drafts({business_id for business_id, _ in wanted})
+
+    queued = 0
+    for business_id, rating in wanted:
+        if stocked.get((business_id, rating), 0) < settings.REVIEW_POOL_DEPTH:
+            queue_review_pool_top_up(business_id, rating)
+            queued += 1
+
+    logger.info(f"Queued {queued} pre-generated review pool top-ups")
+    return queued
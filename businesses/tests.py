@@ -1,3 +1,1146 @@
-from django.test import TestCase
+import asyncio
+import json
+import random
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import openai
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connection
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from businesses import ai_service, backends, benchmarks, checks, clicks, qr, review_pool, rollups, services, tasks
+from businesses.circuit_breaker import CircuitBreaker
+from businesses.models import (
+    Business, CustomerReview, DailyReviewStats, PregeneratedReview, ReviewLink, ensure_review_links,
+)
+from businesses.management.commands.loadtest import percentile
+from businesses.openai_stub import StubOpenAIServer, parse_latency
+from businesses.pagination import paginate_reviews
+from businesses.serializers import BusinessSerializer
+from reviews import views as review_views
+from users.models import User
+
+
+class StubOpenAIMixin:
+    """Points the OpenAI clients at a StubOpenAIServer, with a fresh circuit breaker."""
+
+    def setUp(self):
+        self.server = StubOpenAIServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.settings_override = override_settings(
+            OPENAI_API_KEY='test', OPENAI_BASE_URL=self.server.base_url, OPENAI_MAX_RETRIES=0,
+        )
+        self.settings_override.enable()
+        ai_service._openai_client = None
+        self.now = 0.0
+        self.breaker = CircuitBreaker('OpenAI', min_calls=3, window=5, open_seconds=30, clock=lambda: self.now)
+        breaker_patch = mock.patch.object(ai_service, 'OPENAI_BREAKER', self.breaker)
+        breaker_patch.start()
+        self.addCleanup(breaker_patch.stop)
+
+    def tearDown(self):
+        ai_service._openai_client = None
+        self.settings_override.disable()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class OpenAIClientPoolTests(StubOpenAIMixin, SimpleTestCase):
+    def test_sync_client_reuses_one_connection(self):
+        for _ in range(10):
+            _, method, _ = ai_service.generate_review_with_ai({'food': 4}, '', 'Cafe')
+            self.assertEqual(method, 'ChatGPT API')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_async_client_reuses_one_connection(self):
+        async def submit_many():
+            for _ in range(10):
+                _, method, _ = await ai_service.agenerate_review_with_ai({'food': 4}, '', 'Cafe')
+                self.assertEqual(method, 'ChatGPT API')
+
+        asyncio.run(submit_many())
+        self.assertEqual(self.server.connections, 1)
+
+
+class ReviewDraftTests(StubOpenAIMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        random_patch = mock.patch.object(ai_service.random, 'random', return_value=0.99)  # no humanizer extras
+        random_patch.start()
+        self.addCleanup(random_patch.stop)
+
+    def test_drafts_come_from_one_call(self):
+        drafts, method, _ = ai_service.generate_review_drafts({'food': 4}, '', 'Cafe', count=3)
+        self.assertEqual(method, 'ChatGPT API')
+        self.assertEqual(len(drafts), 3)
+        self.assertEqual(drafts[2].rstrip('.!'), 'Solid spot, good food 3')
+        self.assertEqual(self.server.requests, 1)
+
+    def test_async_drafts_come_from_one_call(self):
+        drafts, _, _ = asyncio.run(ai_service.agenerate_review_drafts({'food': 4}, '', 'Cafe', count=2))
+        self.assertEqual(len(drafts), 2)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_stream_shows_the_first_draft_and_collects_the_rest(self):
+        async def collect():
+            return [event async for event in ai_service.astream_review_with_ai({'food': 4}, '', 'Cafe', count=3)]
+
+        events = asyncio.run(collect())
+        streamed = ''.join(payload for kind, payload in events if kind == 'token')
+        (drafts,) = [payload for kind, payload in events if kind == 'drafts']
+        kind, (ai_review, method, _) = events[-1]
+
+        self.assertEqual(streamed.strip(), 'Solid spot, good food 1.')
+        self.assertEqual(len(drafts), 3)
+        self.assertEqual((kind, ai_review, method), ('done', drafts[0], 'ChatGPT API'))
+        self.assertEqual(self.server.requests, 1)
+
+    def test_fallback_is_a_single_draft(self):
+        self.server.error_rate = 1
+        drafts, method, _ = ai_service.generate_review_drafts({'food': 4}, '', 'Cafe', count=3)
+        self.assertEqual(method, 'Fallback Template')
+        self.assertEqual(len(drafts), 1)
+
+
+class LocalBackendTests(SimpleTestCase):
+    REVIEWS = [
+        {'stars': 5, 'clean_text': 'Loved the pasta here. Staff were super friendly and quick.'},
+        {'stars': 5, 'clean_text': 'Best brunch in town. Staff were lovely and the coffee was great.'},
+        {'stars': 1, 'clean_text': 'Cold soup and a rude waiter. Never again.'},
+    ]
+
+    def test_ngram_reviews_use_words_from_the_same_rating(self):
+        backend = backends.NgramBackend(reviews=self.REVIEWS, min_words=8)
+        five_star_words = set(' '.join(r['clean_text'] for r in self.REVIEWS[:2]).split())
+        for _ in range(50):
+            words = backend.generate(5, '', 'Cafe').split()
+            self.assertGreaterEqual(len(words), 8)
+            self.assertLessEqual(set(words), five_star_words)
+
+    def test_ngram_missing_rating_borrows_from_neighbours(self):
+        backend = backends.NgramBackend(reviews=self.REVIEWS)
+        self.assertEqual(set(backend.models), {1, 2, 4, 5})
+        one_star_words = set(self.REVIEWS[2]['clean_text'].split())
+        self.assertLessEqual(set(backend.generate(2, '', 'Cafe').split()), one_star_words)
+
+    def test_ngram_leads_with_the_customer_feedback(self):
+        backend = backends.NgramBackend(reviews=self.REVIEWS)
+        review = backend.generate(5, 'The tiramisu was amazing.', 'Cafe', tags='dessert')
+        self.assertTrue(review.startswith('The tiramisu was amazing. '))
+        self.assertTrue(review.endswith(' dessert'))
+
+    def test_ngram_without_a_dataset_is_a_configuration_error(self):
+        with mock.patch.object(backends, 'REVIEWS_PATH', '/nonexistent/reviews.json'):
+            with self.assertRaisesMessage(ImproperlyConfigured, '/nonexistent/reviews.json'):
+                backends.build_backend('ngram')
+            with override_settings(REVIEW_LOCAL_BACKEND='ngram'):
+                self.assertEqual([e.id for e in checks.check_local_review_backend(None)], ['businesses.E001'])
+        with mock.patch.object(backends, 'configuration_error', return_value=None), \
+                mock.patch.object(backends, 'load_review_dataset', return_value=[]):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'no reviews to learn from'):
+                backends.build_backend('ngram')
+        with self.assertRaises(ImproperlyConfigured):
+            backends.build_backend('markov')
+        self.assertIsInstance(backends.build_backend('template'), backends.TemplateBackend)
+
+    def test_backends_must_implement_generate(self):
+        class Incomplete(backends.ReviewBackend):
+            method = "Incomplete"
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_openai_failures_fall_back_to_the_local_backend(self):
+        backend = backends.NgramBackend(reviews=self.REVIEWS)
+        with mock.patch.object(backends, '_backend', backend), \
+                mock.patch.object(ai_service, 'get_openai_client', side_effect=openai.APIConnectionError(request=None)), \
+                mock.patch.object(ai_service, 'OPENAI_BREAKER', CircuitBreaker('test')):
+            review, method, _ = ai_service.generate_review_with_ai({'food': 5}, '', 'Cafe')
+        self.assertEqual(method, 'Local N-gram')
+        self.assertTrue(review)
+
+
+class CircuitBreakerTests(StubOpenAIMixin, SimpleTestCase):
+    def generate(self):
+        return ai_service.generate_review_with_ai({'food': 4}, '', 'Cafe')[1]
+
+    def test_opens_after_errors_and_skips_the_api(self):
+        self.server.error_rate = 1
+        for _ in range(3):
+            self.assertEqual(self.generate(), 'Fallback Template')
+        self.assertEqual(self.breaker.state, 'open')
+
+        for _ in range(5):
+            self.assertEqual(self.generate(), 'Fallback Template')
+        self.assertEqual(self.server.requests, 3)
+
+    def test_half_open_probe_restores_service(self):
+        self.server.error_rate = 1
+        for _ in range(3):
+            self.generate()
+
+        self.server.error_rate = 0
+        self.now += 31
+        self.assertEqual(self.generate(), 'ChatGPT API')
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertEqual(self.generate(), 'ChatGPT API')
+
+    def test_failed_probe_reopens(self):
+        self.server.error_rate, self.server.error_status = 1, 503
+        for _ in range(3):
+            self.generate()
+        self.now += 31
+        self.generate()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertEqual(self.server.requests, 4)
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker('test', min_calls=2, slow_call_seconds=1, clock=lambda: self.now)
+        for _ in range(2):
+            breaker.record(breaker.allow(), True, duration=3)
+        self.assertEqual(breaker.state, 'open')
+        self.assertIsNone(breaker.allow())
+
+    def test_calls_from_before_half_open_dont_count_as_probes(self):
+        breaker = CircuitBreaker('test', min_calls=2, open_seconds=30, clock=lambda: self.now)
+        stale = breaker.allow()  # still running when the breaker opens
+        for _ in range(2):
+            breaker.record(breaker.allow(), False)
+        self.now += 31
+        probe = breaker.allow()
+        self.assertTrue(probe.probe)
+
+        breaker.record(stale, True)
+        self.assertEqual(breaker.state, 'half_open')
+        self.assertIsNone(breaker.allow())  # the probe slot is still taken
+
+        breaker.record(probe, True)
+        self.assertEqual(breaker.state, 'closed')
+
+    @override_settings(OPENAI_LATENCY_BUDGET=0.1)
+    def test_latency_budget_returns_the_fallback(self):
+        self.server.latency = parse_latency('fixed:1')
+
+        async def submit():
+            start = time.perf_counter()
+            _, method, _ = await ai_service.agenerate_review_with_ai({'food': 4}, '', 'Cafe')
+            return method, time.perf_counter() - start
+
+        method, elapsed = asyncio.run(submit())
+        self.assertEqual(method, 'Fallback Template')
+        self.assertLess(elapsed, 0.8)
+
+
+class ReviewIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.reviews = [
+            {'stars': stars, 'clean_text': f'{stars} star review {i}'} for stars in (1, 2, 2, 4, 5) for i in range(2)
+        ]
+        self.index = ai_service.build_review_index(self.reviews)
+        for name, value in (('REVIEW_DATASET', self.reviews), ('REVIEW_INDEX', self.index)):
+            patcher = mock.patch.object(ai_service, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_index_has_exact_and_nearby_buckets_for_each_rating(self):
+        self.assertEqual(list(self.index), [1, 2, 3, 4, 5])
+
+        def stars(reviews):
+            return sorted(review['stars'] for review in reviews)
+
+        self.assertEqual(stars(self.index[2][0]), [2] * 4)
+        self.assertEqual(stars(self.index[2][1]), [1, 1, 2, 2, 2, 2])
+        self.assertEqual(self.index[3][0], [])
+        self.assertEqual(stars(self.index[3][1]), [2, 2, 2, 2, 4, 4])
+        self.assertIs(self.index[5][0][0], self.reviews[-2])  # the dataset's own dicts, not copies
+
+    def test_examples_fall_back_to_nearby_ratings(self):
+        self.assertEqual({r['stars'] for r in ai_service.get_example_reviews(2, 3)}, {2})
+        self.assertTrue({r['stars'] for r in ai_service.get_example_reviews(3, 3)} <= {2, 4})
+
+    def test_out_of_range_ratings_are_clamped_without_growing_the_index(self):
+        self.assertEqual({r['stars'] for r in ai_service.get_example_reviews(99, 2)}, {5})
+        self.assertEqual({r['stars'] for r in ai_service.get_example_reviews(-3, 2)}, {1})
+        self.assertEqual(list(ai_service.REVIEW_INDEX), [1, 2, 3, 4, 5])
+
+
+def legacy_humanize(text, rating):
+    """The original multi-pass humanize(), kept as a reference."""
+    for formal, casual_options in ai_service.HUMANIZERS["casual_replacements"].items():
+        if formal in text.lower():
+            replacement = random.choice(casual_options)
+            pattern = re.compile(re.escape(formal), re.IGNORECASE)
+            text = pattern.sub(replacement, text)
+    text = text.replace('"', '').replace("'", "'")
+    if random.random() < 0.05:
+        starter = random.choice(ai_service.HUMANIZERS["starters"])
+        text = f"{starter} {text}"
+    if text.endswith('.'):
+        text = text[:-1] + random.choice(ai_service.HUMANIZERS["endings"])
+    if random.random() < 0.20 and len(text) > 1:
+        text = text[0].lower() + text[1:]
+    text = re.sub(r'!{2,}', '!', text)
+    if rating >= 4 and random.random() < 0.15:
+        emoji = random.choice(ai_service.HUMANIZERS["emojis"])
+        text = f"{text} {emoji}"
+    for full, short in ai_service.CONTRACTIONS.items():
+        text = re.sub(rf'\b{full}\b', short, text, flags=re.IGNORECASE)
+    words = text.split()
+    if len(words) > 5 and random.random() < 0.40:
+        for i in range(1, len(words) - 1):
+            if words[i].lower() in ["good", "bad", "nice", "slow", "fast", "busy", "quick"]:
+                intensifier = random.choice(ai_service.HUMANIZERS["intensifiers"])
+                words[i] = f"{intensifier} {words[i]}"
+                break
+        text = " ".join(words)
+    for transition in ai_service.AI_TRANSITIONS:
+        text = text.replace(transition, "")
+    return text.strip()
+
+
+HUMANIZE_SAMPLES = [
+    'The food was very good and the staff were EXCELLENT. It is not cheap, though.',
+    '"Absolutely delicious!!!" I am coming back. That is not a joke. It is great.',
+    'Additionally, the wait was terrible. However, the desserts were wonderful.',
+    'Service was quite slow and I did not love it. Furthermore, it is loud.',
+    'We cannot wait to return, the pasta was extremely good and very nice.',
+    'Short one.',
+    'Moreover, the staff is not friendly but the coffee was fast and good.',
+]
+
+
+class HumanizeTests(SimpleTestCase):
+    def test_matches_legacy_output_for_same_seed(self):
+        for seed in range(300):
+            for rating in (2, 5):
+                for text in HUMANIZE_SAMPLES:
+                    random.seed(seed)
+                    expected = legacy_humanize(text, rating)
+                    random.seed(seed)
+                    self.assertEqual(ai_service.humanize(text, rating), expected)
+
+
+class PromptLayoutTests(SimpleTestCase):
+    def test_every_request_starts_with_the_same_static_prefix(self):
+        requests = [
+            ai_service.build_review_request(5, '', 'Cafe', ''),
+            ai_service.build_review_request(1, 'Cold food and a long wait', 'Diner', 'slow'),
+        ]
+        for request in requests:
+            system, user = request['messages']
+            self.assertIs(system['content'], ai_service.REVIEW_SYSTEM_PROMPT)
+            self.assertNotIn('NEVER use these AI phrases', user['content'])
+        self.assertIn('Diner', requests[1]['messages'][1]['content'])
+
+    def test_usage_is_split_into_cached_and_uncached(self):
+        before = ai_service.prompt_usage_totals()
+        usage = mock.Mock(prompt_tokens=1200, completion_tokens=40, prompt_tokens_details=mock.Mock(cached_tokens=1024))
+
+        self.assertEqual(ai_service.record_prompt_usage(usage), 1024)
+        self.assertEqual(ai_service.record_prompt_usage(
+            mock.Mock(prompt_tokens=300, completion_tokens=40, prompt_tokens_details=None)
+        ), 0)
+
+        after = ai_service.prompt_usage_totals()
+        self.assertEqual(after['calls'] - before['calls'], 2)
+        self.assertEqual(after['prompt_tokens'] - before['prompt_tokens'], 1500)
+        self.assertEqual(after['cached_tokens'] - before['cached_tokens'], 1024)
+
+
+class MetricsTests(SimpleTestCase):
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_generation_stages_and_fallbacks_are_recorded(self):
+        openai_calls = self.sample('reviewbud_review_stage_seconds_count', stage='openai')
+        timeouts = self.sample('reviewbud_review_fallbacks_total', exception='APITimeoutError')
+        client = mock.Mock()
+        client.chat.completions.create.side_effect = openai.APITimeoutError(request=mock.Mock())
+
+        with mock.patch.object(ai_service, 'get_openai_client', return_value=client), \
+                mock.patch.object(ai_service, 'OPENAI_BREAKER', CircuitBreaker('test')):
+            _, method, _ = ai_service.generate_review_with_ai({'food': 5}, '', 'Cafe')
+
+        self.assertEqual(method, 'Fallback Template')
+        self.assertEqual(self.sample('reviewbud_review_stage_seconds_count', stage='openai'), openai_calls + 1)
+        self.assertEqual(self.sample('reviewbud_review_fallbacks_total', exception='APITimeoutError'), timeouts + 1)
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_endpoint_requires_the_token_and_reports_request_latency(self):
+        url = reverse('businesses:metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'reviewbud_request_seconds_bucket', response.content)
+        self.assertIn(b'view="businesses:metrics"', response.content)
+
+    def test_endpoint_is_hidden_without_a_token(self):
+        self.assertEqual(self.client.get(reverse('businesses:metrics')).status_code, 404)
+
+
+@override_settings(CLICK_BUFFERED=True, CLICK_FLUSH_INTERVAL=3600, CLICK_FLUSH_THRESHOLD=10**9)
+class ClickCounterTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create(username='owner')
+        business = Business.objects.create(
+            owner=owner, name='Cafe', address='1 Main St',
+            google_review_url='https://search.google.com/local/writereview?placeid=abc',
+        )
+        self.link = business.get_review_link()
+
+    def test_concurrent_clicks_are_counted_exactly(self):
+        threads_count, clicks_per_thread = 8, 500
+        recording = threading.Event()
+        recording.set()
+
+        def scan():
+            for _ in range(clicks_per_thread):
+                clicks.record_click(self.link.pk)
+
+        def flush_while_recording():
+            while recording.is_set():
+                clicks.flush_clicks()
+
+        flusher = threading.Thread(target=flush_while_recording)
+        scanners = [threading.Thread(target=scan) for _ in range(threads_count)]
+        flusher.start()
+        for thread in scanners:
+            thread.start()
+        for thread in scanners:
+            thread.join()
+        recording.clear()
+        flusher.join()
+        clicks.flush_clicks()
+
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.click_count, threads_count * clicks_per_thread)
+
+    def test_failed_flush_keeps_clicks(self):
+        for _ in range(3):
+            clicks.record_click(self.link.pk)
+
+        with mock.patch.object(ReviewLink.objects, 'filter', side_effect=DatabaseError('locked')):
+            self.assertEqual(clicks.flush_clicks(), 0)
+        self.assertEqual(clicks.pending_clicks(self.link.pk), 3)
+
+        self.assertEqual(clicks.flush_clicks(), 3)
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.click_count, 3)
+
+    def test_buffered_clicks_live_in_the_shared_cache(self):
+        for _ in range(2):
+            clicks.record_click(self.link.pk)
+
+        # Nothing is held by this process, so a restarted or different worker can flush them
+        self.assertEqual(cache.get(clicks.COUNT_KEY.format(self.link.pk)), 2)
+        self.assertEqual(clicks.flush_clicks(), 2)
+        self.assertEqual(clicks.flush_clicks(), 0)
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.click_count, 2)
+
+    def test_clicks_during_a_flush_are_written_by_the_next_one(self):
+        clicks.record_click(self.link.pk)
+        write = clicks._write_clicks
+
+        def write_while_clicked(batch):
+            write(batch)
+            clicks.record_click(self.link.pk)
+
+        with mock.patch.object(clicks, '_write_clicks', write_while_clicked):
+            self.assertEqual(clicks.flush_clicks(), 1)
+        self.assertEqual(clicks.pending_clicks(self.link.pk), 1)
+        self.assertEqual(clicks.flush_clicks(), 1)
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.click_count, 2)
+
+    def test_only_one_process_flushes_at_a_time(self):
+        clicks.record_click(self.link.pk)
+        cache.add(clicks.FLUSH_LOCK, True)
+        self.assertEqual(clicks.flush_clicks(), 0)
+        cache.delete(clicks.FLUSH_LOCK)
+        self.assertEqual(clicks.flush_clicks(), 1)
+
+    @override_settings(CLICK_BUFFERED=False)
+    def test_without_a_shared_cache_clicks_are_written_straight_away(self):
+        clicks.record_click(self.link.pk)
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.click_count, 1)
+        self.assertEqual(DailyReviewStats.objects.get().clicks, 1)
+
+
+class StubPlacesEndpoint:
+    """Stands in for the Places session's get() against places.googleapis.com."""
+
+    def __init__(self, stats, failures=None):
+        self.stats = stats  # place_id -> (rating, count)
+        self.failures = dict(failures or {})  # place_id -> 503s before success
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url, headers=None, timeout=None):
+        place_id = url.rsplit('/', 1)[-1]
+        with self.lock:
+            self.calls.append(place_id)
+            failing = self.failures.get(place_id, 0) > 0
+            if failing:
+                self.failures[place_id] -= 1
+
+        response = mock.Mock(status_code=503 if failing else 200)
+        rating, count = self.stats.get(place_id, (None, None))
+        response.json.return_value = {'rating': rating, 'userRatingCount': count}
+        return response
+
+
+@override_settings(PLACES_QPS=1000, PLACES_REFRESH_CHUNK_SIZE=2, PLACES_REFRESH_CONCURRENCY=2)
+class PlacesRefreshTaskTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create(username='owner')
+
+    def stub_places(self, places):
+        return mock.patch.object(services.get_places_session(), 'get', places)
+
+    def make_business(self, place_id, **kwargs):
+        return Business.objects.create(
+            owner=self.owner, name=f'Cafe {place_id}', address='1 Main St', place_id=place_id,
+            google_review_url=f'https://search.google.com/local/writereview?placeid={place_id}',
+            **kwargs,
+        )
+
+    def test_single_business_task_retries_until_success(self):
+        business = self.make_business('p1')
+        places = StubPlacesEndpoint({'p1': (4.6, 120)}, failures={'p1': 2})
+
+        with self.stub_places(places):
+            tasks.update_google_stats_for_one_business.apply(args=[business.id])
+
+        business.refresh_from_db()
+        self.assertEqual((business.rating, business.total_reviews), (4.6, 120))
+        self.assertEqual(places.calls, ['p1', 'p1', 'p1'])
+
+    def test_single_business_task_gives_up_and_stops_the_polling(self):
+        business = self.make_business('p1')
+        places = StubPlacesEndpoint({'p1': (4.6, 120)}, failures={'p1': 100})
+
+        with self.stub_places(places):
+            result = tasks.update_google_stats_for_one_business.apply(args=[business.id])
+
+        self.assertTrue(result.failed())
+        self.assertEqual(len(places.calls), tasks.update_google_stats_for_one_business.max_retries + 1)
+        business.refresh_from_db()
+        self.assertIsNotNone(business.stats_failed_at)
+        self.assertFalse(business.stats_pending)
+
+    def test_new_business_stats_are_fetched_in_the_background(self):
+        self.client.force_login(self.owner)
+        places = StubPlacesEndpoint({'p1': (4.6, 120)})
+
+        with self.stub_places(places), self.captureOnCommitCallbacks() as queued:
+            self.client.post(reverse('businesses:create_business'), {
+                'name': 'Diner', 'address': '1 Main St', 'place_id': 'p1',
+                'google_review_url': 'https://search.google.com/local/writereview?placeid=p1',
+            })
+        self.assertEqual(places.calls, [])  # the owner didn't wait on Places
+        self.assertEqual(len(queued), 1)
+
+        business = Business.objects.get(place_id='p1')
+        stats_url = reverse('businesses:business_stats', args=[business.id])
+        self.assertEqual(self.client.get(stats_url).json(), {'rating': None, 'total_reviews': None, 'pending': True})
+
+        with self.stub_places(places):
+            tasks.update_google_stats_for_one_business.apply(args=[business.id])
+        self.assertEqual(self.client.get(stats_url).json(), {'rating': 4.6, 'total_reviews': 120, 'pending': False})
+
+    def test_sweep_refreshes_active_businesses_in_chunks(self):
+        stale = [self.make_business(f'p{i}', rating=1.0, total_reviews=1) for i in range(5)]
+        inactive = self.make_business('off', is_active=False)
+        places = StubPlacesEndpoint(
+            {f'p{i}': (4.0 + i / 10, 10 * i) for i in range(5)},
+            failures={'p3': 1},
+        )
+
+        with self.stub_places(places):
+            updated = tasks.refresh_google_stats.apply().get()
+
+        self.assertEqual(updated, 5)
+        self.assertEqual(places.calls.count('p3'), 2)  # failed, then retried in the next chunk
+        for i, business in enumerate(stale):
+            business.refresh_from_db()
+            self.assertEqual((business.rating, business.total_reviews), (4.0 + i / 10, 10 * i))
+        self.assertNotIn('off', places.calls)
+        inactive.refresh_from_db()
+        self.assertIsNone(inactive.rating)
+
+    @override_settings(PLACES_REFRESH_ATTEMPTS=3)
+    def test_sweep_retries_failures_through_its_own_rate_limit(self):
+        for i in range(3):
+            self.make_business(f'p{i}')
+        places = StubPlacesEndpoint({f'p{i}': (4.0, 10) for i in range(3)}, failures={'p1': 100})
+        limiter = services.RateLimiter(1000)
+
+        with self.stub_places(places), \
+                mock.patch.object(tasks, 'RateLimiter', return_value=limiter), \
+                mock.patch.object(limiter, 'acquire', wraps=limiter.acquire) as acquire, \
+                mock.patch.object(tasks.update_google_stats_for_one_business, 'delay') as delay:
+            self.assertEqual(tasks.refresh_google_stats.apply().get(), 2)
+
+        self.assertEqual(places.calls.count('p1'), 3)
+        self.assertEqual(acquire.call_count, len(places.calls))
+        delay.assert_not_called()
+        self.assertTrue(Business.objects.get(place_id='p1').stats_pending)
+
+    def test_place_stats_are_cached_by_place_id(self):
+        places = StubPlacesEndpoint({'p1': (4.2, 50)})
+
+        with self.stub_places(places):
+            for _ in range(3):
+                self.assertEqual(services.fetch_google_stats_for_place('p1'), (4.2, 50))
+            services.request_google_stats_for_place('p1', use_cache=False)
+
+        self.assertEqual(places.calls, ['p1', 'p1'])
+
+    def test_background_tasks_without_a_broker_close_their_connections(self):
+        task = mock.Mock()
+        task.apply.side_effect = services.PlacesAPIError('down')
+
+        with mock.patch.object(tasks, 'close_old_connections') as close:
+            future = tasks.run_in_background(task, 7)
+            with self.assertRaises(services.PlacesAPIError):
+                future.result(timeout=5)
+
+        task.apply.assert_called_once_with(args=(7,))
+        close.assert_called_once()
+
+    def test_schedule_runs_without_a_broker_once_per_interval(self):
+        schedule = {
+            'sweep': {'task': 'businesses.tasks.refresh_google_stats', 'schedule': 3600},
+        }
+        with override_settings(CELERY_BEAT_SCHEDULE=schedule), \
+                mock.patch.object(tasks.refresh_google_stats, 'apply') as sweep:
+            self.assertEqual(tasks.run_due_tasks(), ['sweep'])
+            self.assertEqual(tasks.run_due_tasks(), [])
+
+        sweep.assert_called_once()
+
+
+# Plain static storage so pages render without a collectstatic manifest
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class QueryBudgetMixin:
+    """
+    Fails if a page's query count grows with the number of businesses.
+
+    assertConstantQueries renders the page for each size in `sizes` and
+    requires every render to run the same number of queries.
+    """
+    query_budget_sizes = (1, 5, 25)
+
+    def add_businesses(self, count):
+        for _ in range(count):
+            self.business_count = getattr(self, 'business_count', 0) + 1
+            business = Business.objects.create(
+                owner=self.owner, name=f'Cafe {self.business_count}', address='1 Main St',
+                place_id=f'place-{self.business_count}',
+                google_review_url='https://search.google.com/local/writereview?placeid=abc',
+            )
+            business.get_review_link()
+
+    def assertConstantQueries(self, url):
+        counts = {}
+        self.client.get(url)  # warm up session and caches
+        for size in self.query_budget_sizes:
+            self.add_businesses(size - getattr(self, 'business_count', 0))
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts[size] = len(queries)
+
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f"Query count for {url} scales with the number of businesses: {counts}",
+        )
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class OwnerPageQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='agency')
+        self.client.force_login(self.owner)
+
+    def test_dashboard(self):
+        self.assertConstantQueries(reverse('businesses:dashboard'))
+
+    def test_analytics(self):
+        self.add_businesses(1)
+        first = Business.objects.filter(owner=self.owner).first()
+        self.assertConstantQueries(f"{reverse('businesses:analytics')}?business={first.id}")
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class RollupTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='owner')
+        self.business = Business.objects.create(owner=self.owner, name='Cafe', google_review_url='https://g.co/r')
+        self.link = self.business.get_review_link()
+        other = Business.objects.create(owner=self.owner, name='Diner', google_review_url='https://g.co/r')
+        self.other_link = other.get_review_link()
+
+    def add_review(self, rating, days_ago=0, link=None):
+        """A review as submitted `days_ago` days ago, counted the way the review views count it."""
+        link = link or self.link
+        when = timezone.now() - timedelta(days=days_ago)
+        review = CustomerReview.objects.create(
+            business=link.business, review_link=link, rating=rating, ai_review='Lovely', feedback='',
+        )
+        CustomerReview.objects.filter(pk=review.pk).update(created_at=when)
+        rollups.record_review(link.business_id, rating, when)
+
+    def rollup_rows(self):
+        return {
+            (row['business_id'], row['date']): row
+            for row in DailyReviewStats.objects.values('business_id', 'date', *rollups.REVIEW_FIELDS, 'clicks')
+        }
+
+    def test_incremental_counts_match_a_backfill(self):
+        for rating, days_ago in [(5, 0), (5, 0), (4, 0), (2, 1), (1, 3), (3, 40)]:
+            self.add_review(rating, days_ago)
+        self.add_review(4, link=self.other_link)
+        rollups.record_clicks({self.link.pk: 6, self.other_link.pk: 2, 10**6: 9})
+        incremental = self.rollup_rows()
+
+        DailyReviewStats.objects.update(**dict.fromkeys(rollups.REVIEW_FIELDS, 0))
+        call_command('backfill_rollups', stdout=StringIO())
+
+        self.assertEqual(self.rollup_rows(), incremental)
+        today = incremental[(self.business.id, timezone.localdate())]
+        self.assertEqual(
+            (today['submissions'], today['rating_sum'], today['rating_5'], today['clicks']), (3, 14, 2, 6),
+        )
+
+    def test_backfill_of_one_business_leaves_the_others(self):
+        self.add_review(5)
+        self.add_review(3, link=self.other_link)
+        DailyReviewStats.objects.update(**dict.fromkeys(rollups.REVIEW_FIELDS, 0))
+
+        call_command('backfill_rollups', business=self.business.id, stdout=StringIO())
+
+        self.assertEqual(DailyReviewStats.objects.get(business=self.business).submissions, 1)
+        self.assertEqual(DailyReviewStats.objects.get(business=self.other_link.business).submissions, 0)
+
+    def test_analytics_reports_histogram_average_and_conversion(self):
+        for rating in (5, 5, 4, 2):
+            self.add_review(rating)
+        self.add_review(1, days_ago=40)  # in the histogram, not in the 30-day totals
+        rollups.record_clicks({self.link.pk: 8})
+        self.client.force_login(self.owner)
+
+        response = self.client.get(f"{reverse('businesses:analytics')}?business={self.business.id}")
+
+        activity = response.context['activity']
+        self.assertEqual((activity['submissions'], activity['clicks']), (4, 8))
+        self.assertEqual(activity['average_rating'], 4.0)
+        self.assertEqual(activity['conversion'], 50)
+        self.assertEqual(activity['histogram'], {1: 1, 2: 1, 3: 0, 4: 1, 5: 2})
+        self.assertEqual(len(activity['series']), 365)
+        self.assertEqual(activity['series'][-1], {'date': timezone.localdate().isoformat(), 'submissions': 4, 'clicks': 8})
+
+    def test_no_clicks_means_no_conversion(self):
+        self.add_review(3)
+        activity = rollups.summarize_daily_stats(self.business)
+        self.assertIsNone(activity['conversion'])
+        self.assertEqual(activity['average_rating'], 3.0)
+
+    async def test_review_is_not_saved_when_its_rollup_fails(self):
+        with mock.patch('reviews.views.record_review', side_effect=DatabaseError('locked')):
+            with self.assertRaises(DatabaseError):
+                await review_views.save_review(self.link, 4, '', 'Lovely', 'stub', None)
+
+        self.assertEqual(await CustomerReview.objects.acount(), 0)
+        self.assertEqual(await DailyReviewStats.objects.acount(), 0)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class QRCodeTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='owner')
+        self.business = Business.objects.create(owner=self.owner, name='Cafe', google_review_url='https://g.co/r')
+        self.url = reverse('businesses:qr_code', args=[self.business.get_review_link().token])
+
+    def test_png_is_served_with_a_long_lived_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertIn('immutable', response['Cache-Control'])
+
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+
+    def test_svg(self):
+        response = self.client.get(self.url, {'format': 'svg'})
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', response.content)
+        self.assertNotEqual(response['ETag'], self.client.get(self.url)['ETag'])
+
+    def test_size_is_clamped_and_validated(self):
+        def etag(size):
+            return self.client.get(self.url, {'size': size})['ETag']
+
+        self.assertEqual(etag(1000), etag(qr.MAX_BOX_SIZE))
+        self.assertEqual(etag(-5), etag(1))
+        self.assertNotEqual(etag(5), etag(6))
+        self.assertEqual(self.client.get(self.url, {'size': 'big'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'format': 'gif'}).status_code, 400)
+
+    def test_render_version_is_in_the_image_urls(self):
+        self.client.force_login(self.owner)
+        page = self.client.get(reverse('businesses:create_qr_code', args=[self.business.review_link.token]))
+        self.assertContains(page, f'{self.url}?v={qr.QR_RENDER_VERSION}&amp;format=svg')
+
+        with mock.patch.object(qr, 'QR_RENDER_VERSION', qr.QR_RENDER_VERSION + 1):
+            self.assertTrue(qr.qr_code_url(self.business.review_link).endswith(f'?v={qr.QR_RENDER_VERSION}'))
+            bumped = self.client.get(self.url)['ETag']
+        self.assertNotEqual(bumped, self.client.get(self.url)['ETag'])
+
+    def test_new_business_qr_codes_are_rendered_ahead(self):
+        qr.render_qr_code.cache_clear()
+        self.client.force_login(self.owner)
+        with mock.patch('businesses.views.queue_google_stats_refresh'):
+            self.client.post(reverse('businesses:create_business'), {
+                'name': 'Diner', 'address': '1 Main St', 'place_id': 'p1',
+                'google_review_url': 'https://search.google.com/local/writereview?placeid=p1',
+            })
+        self.assertEqual(qr.render_qr_code.cache_info().misses, 2)  # PNG and SVG
+
+        link = Business.objects.get(name='Diner').review_link
+        for fmt in qr.QR_CONTENT_TYPES:
+            self.client.get(reverse('businesses:qr_code', args=[link.token]), {'format': fmt})
+        self.assertEqual(qr.render_qr_code.cache_info().misses, 2)
+        self.assertEqual(qr.render_qr_code.cache_info().hits, 2)
+
+
+class BusinessSerializerTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='agency')
+
+    def create_businesses(self, count):
+        Business.objects.bulk_create(
+            Business(
+                owner=self.owner, name=f'Cafe {i}', address='1 Main St',
+                google_review_url='https://search.google.com/local/writereview?placeid=abc',
+            )
+            for i in range(count)
+        )
+
+    def serialize(self):
+        businesses = ensure_review_links(
+            Business.objects.filter(owner=self.owner).select_related('review_link')
+        )
+        return BusinessSerializer(businesses, many=True).data
+
+    def count_queries(self, business_count):
+        Business.objects.filter(owner=self.owner).delete()
+        self.create_businesses(business_count)
+        self.serialize()  # creates the missing links
+        with CaptureQueriesContext(connection) as queries:
+            data = self.serialize()
+        self.assertEqual(len(data), business_count)
+        return len(queries)
+
+    def test_query_count_is_constant(self):
+        self.assertEqual(self.count_queries(1), self.count_queries(1000))
+
+    def test_missing_links_are_created_in_one_bulk_create(self):
+        self.create_businesses(1000)
+        with mock.patch.object(
+            ReviewLink.objects, 'bulk_create', wraps=ReviewLink.objects.bulk_create,
+        ) as bulk_create:
+            data = self.serialize()
+
+        bulk_create.assert_called_once()
+        self.assertEqual(ReviewLink.objects.count(), 1000)
+        self.assertTrue(all(item['review_link'] for item in data))
+
+    def test_serialization_is_read_only_once_links_exist(self):
+        self.create_businesses(3)
+        self.serialize()
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.serialize()
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(ReviewLink.objects.count(), 3)
+        link = ReviewLink.objects.get(business_id=data[0]['id'])
+        self.assertEqual(data[0]['review_link'], f'https://reviewbud.co/reviews/review/{link.token}/')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ReviewPaginationTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='owner')
+        self.business = Business.objects.create(owner=self.owner, name='Cafe')
+        link = self.business.get_review_link()
+        other = Business.objects.create(owner=self.owner, name='Other Cafe')
+        CustomerReview.objects.create(business=other, review_link=other.get_review_link(), rating=5, feedback='x')
+
+        CustomerReview.objects.bulk_create(
+            CustomerReview(business=self.business, review_link=link, rating=1 + i % 5, feedback=f'review {i}')
+            for i in range(12)
+        )
+        # Several reviews share a timestamp so the id tie-break matters
+        oldest = link.reviews.order_by('id').values_list('id', flat=True)[:6]
+        CustomerReview.objects.filter(id__in=list(oldest)).update(created_at=timezone.now())
+        self.newest_first = list(
+            self.business.reviews.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def test_pages_cover_every_review_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            page, cursor = paginate_reviews(self.business.reviews.all(), cursor, page_size=5)
+            seen += [review.id for review in page]
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.newest_first)
+
+    def test_page_runs_one_query(self):
+        _, cursor = paginate_reviews(self.business.reviews.all(), page_size=5)
+        with CaptureQueriesContext(connection) as queries:
+            page, _ = paginate_reviews(self.business.reviews.all(), cursor, page_size=5)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([review.id for review in page], self.newest_first[5:10])
+
+    def test_listing_view(self):
+        self.client.force_login(self.owner)
+        url = reverse('businesses:business_reviews', args=[self.business.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['reviews']), 12)
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 404)
+
+
+class ReviewAPITests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='owner')
+        self.business = Business.objects.create(owner=self.owner, name='Cafe')
+        self.link = self.business.get_review_link()
+        stranger = User.objects.create(username='stranger')
+        other = Business.objects.create(owner=stranger, name='Not Yours')
+        CustomerReview.objects.create(business=other, review_link=other.get_review_link(), rating=1, feedback='x')
+        for i in range(30):
+            self.add_review(f'review {i}')
+        self.client.force_login(self.owner)
+
+    def add_review(self, feedback):
+        return CustomerReview.objects.create(
+            business=self.business, review_link=self.link, rating=5, feedback=feedback,
+        )
+
+    def test_reviews_are_cursor_paginated_and_owner_scoped(self):
+        url = reverse('businesses:api-review-list')
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), 25)
+        self.assertNotIn('Not Yours', {review['business_name'] for review in first['results']})
+
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+        ids = [review['id'] for review in first['results'] + second['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse('businesses:api-business-list'), {'fields': 'id,name'})
+        self.assertEqual(response.json()['results'], [{'id': self.business.id, 'name': 'Cafe'}])
+
+    def test_unchanged_list_is_not_modified(self):
+        url = reverse('businesses:api-review-list')
+        response = self.client.get(url, {'business': self.business.id})
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'business': self.business.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        review_queries = [q['sql'] for q in queries if 'businesses_customerreview' in q['sql']]
+        self.assertEqual(len(review_queries), 1)  # the version aggregate only
+        self.assertIn('MAX', review_queries[0])
+
+        self.add_review('new review')
+        response = self.client.get(url, {'business': self.business.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_editing_a_business_changes_its_etag(self):
+        url = reverse('businesses:api-business-detail', args=[self.business.id])
+        etag = self.client.get(url)['ETag']
+        self.business.name = 'Renamed Cafe'
+        self.business.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Renamed Cafe')
+
+    def test_other_owners_business_is_not_found(self):
+        other = Business.objects.get(name='Not Yours')
+        response = self.client.get(reverse('businesses:api-business-detail', args=[other.id]))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+
+@override_settings(OPENAI_API_KEY='sk-test', REVIEW_POOL_DEPTH=3)
+class ReviewPoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.business = Business.objects.create(owner=User.objects.create(username='owner'), name='Cafe')
+        self.generated = 0
+
+    def fake_generate(self, ratings, feedback, business_name, tags=""):
+        self.generated += 1
+        return f"{business_name} draft {self.generated}", "ChatGPT API", ai_service.average_rating(ratings)
+
+    def test_fill_tops_up_to_depth_and_claims_hand_out_each_draft_once(self):
+        with mock.patch.object(review_pool, 'generate_review_with_ai', self.fake_generate):
+            self.assertEqual(review_pool.fill_review_pool(self.business.id, 5), 3)
+            claimed = review_pool.claim_review(self.business.id, 5)
+            self.assertEqual(review_pool.fill_review_pool(self.business.id, 5), 1)
+
+        self.assertEqual(claimed, "Cafe draft 1")
+        texts = {review_pool.claim_review(self.business.id, 5) for _ in range(3)}
+        self.assertEqual(texts, {"Cafe draft 2", "Cafe draft 3", "Cafe draft 4"})
+        self.assertIsNone(review_pool.claim_review(self.business.id, 5))
+        self.assertIsNone(review_pool.claim_review(self.business.id, 4))
+
+    def test_fallback_templates_are_not_stocked(self):
+        fallback = mock.Mock(return_value=("template", "Fallback Template", 5))
+        with mock.patch.object(review_pool, 'generate_review_with_ai', fallback):
+            self.assertEqual(review_pool.fill_review_pool(self.business.id, 5), 0)
+        fallback.assert_called_once()
+
+    def test_expired_drafts_are_not_handed_out(self):
+        PregeneratedReview.objects.create(business=self.business, rating=5, text="old")
+        PregeneratedReview.objects.update(created_at=timezone.now() - timedelta(days=30))
+        self.assertIsNone(review_pool.claim_review(self.business.id, 5))
+
+    def test_sweep_only_stocks_ratings_the_business_receives(self):
+        idle = Business.objects.create(owner=self.business.owner, name='Idle Cafe')
+        DailyReviewStats.objects.create(
+            business=self.business, date=timezone.localdate(), submissions=2, rating_4=1, rating_5=1,
+        )
+        PregeneratedReview.objects.bulk_create(
+            PregeneratedReview(business=self.business, rating=4, text=f"draft {i}") for i in range(3)
+        )
+
+        with mock.patch.object(tasks, 'queue_review_pool_top_up') as queue:
+            self.assertEqual(tasks.top_up_review_pools(), 1)
+        queue.assert_called_once_with(self.business.id, 5)
+        self.assertNotIn(idle.id, [call.args[0] for call in queue.call_args_list])
+
+
+class OpenAIStubTests(SimpleTestCase):
+    def test_latency_specs(self):
+        self.assertEqual(parse_latency('none')(), 0)
+        self.assertEqual(parse_latency('fixed:0.25')(), 0.25)
+        self.assertTrue(all(0.5 <= parse_latency('uniform:0.5,2')() <= 2 for _ in range(100)))
+        self.assertGreater(parse_latency('lognormal:0.8,0.5')(), 0)
+        for spec in ('fixed', 'uniform:1', 'gamma:1,2', 'fixed:fast'):
+            with self.assertRaises(ValueError):
+                parse_latency(spec)
+
+    def test_percentile_is_nearest_rank(self):
+        timings = list(range(1, 101))
+        random.shuffle(timings)
+        self.assertEqual([percentile(timings, p) for p in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual(percentile([7], 99), 7)
+
+
+@override_settings(STORAGES=TEST_STORAGES, REVIEW_POOL_DEPTH=0)
+class LoadTestCommandTests(StubOpenAIMixin, LiveServerTestCase):
+    def tearDown(self):
+        clicks.flush_clicks()  # while the test database is still there
+        super().tearDown()
+
+    def loadtest(self, *args):
+        out = StringIO()
+        call_command('loadtest', '--url', self.live_server_url, '--requests', '12', '--concurrency', '3', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reports_throughput_and_percentiles(self):
+        out = self.loadtest()
+        reviews = int(re.match(r'(\d+) reviews in [\d.]+ s at concurrency 3: [\d.]+ reviews/sec', out)[1])
+        self.assertRegex(out, r'review: p50 +\d+ ms  p95 +\d+ ms  p99 +\d+ ms')
+        self.assertIn(f"{{'ChatGPT API': {reviews}}}", out)
+        # SQLite can refuse the odd concurrent write here; those show up as errors, not reviews
+        self.assertEqual(CustomerReview.objects.count(), reviews)
+        self.assertGreaterEqual(reviews, 10)
+
+    def test_streaming_reports_time_to_first_token(self):
+        out = self.loadtest('--stream')
+        self.assertIn('first_token: p50', out)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def run_suite(self, *args):
+        out = StringIO()
+        call_command('bench_suite', '--only', 'ai.humanize', '--only', 'page.dashboard',
+                     '--rounds', '1', '--scale', '0.01', *args, stdout=out)
+        return out.getvalue()
+
+    def test_compare_flags_slowdowns_and_extra_queries(self):
+        baseline = {
+            'page.dashboard': {'seconds': 0.010, 'queries': 3},
+            'ai.humanize': {'seconds': 0.001, 'queries': None},
+        }
+        results = {
+            'page.dashboard': {'seconds': 0.011, 'queries': 4},
+            'ai.humanize': {'seconds': 0.002, 'queries': None},
+            'qr.png': {'seconds': 0.001, 'queries': 1},
+        }
+        rows, regressions = benchmarks.compare(results, baseline, tolerance=0.25)
+        self.assertEqual(regressions, ['page.dashboard makes 4 queries, was 3', 'ai.humanize is 100% slower'])
+        self.assertEqual([row[0] for row in rows if row[2] is None], ['qr.png'])
+
+    def test_requires_a_baseline_then_fails_on_a_regression(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'baseline.json')
+            with self.assertRaisesMessage(CommandError, 'no baseline at'):
+                self.run_suite('--baseline', path)
+            self.assertIn('page.dashboard', self.run_suite('--baseline', path, '--no-baseline'))
+
+            self.run_suite('--baseline', path, '--update-baseline')
+            with open(path) as f:
+                run = json.load(f)
+            self.assertEqual(set(run['benchmarks']), {'ai.humanize', 'page.dashboard'})
+            self.assertEqual(run['benchmarks']['page.dashboard']['queries'], 3)
+            self.assertIsNone(run['benchmarks']['ai.humanize']['queries'])
+
+            out = self.run_suite('--baseline', path, '--tolerance', '100')
+            self.assertIn('page.dashboard', out)
+
+            run['benchmarks']['page.dashboard']['queries'] = 2
+            with open(path, 'w') as f:
+                json.dump(run, f)
+            with self.assertRaisesMessage(CommandError, 'page.dashboard makes 3 queries, was 2'):
+                self.run_suite('--baseline', path, '--tolerance', '100')
+
+        self.assertFalse(Business.objects.exists())  # the benchmark data was rolled back
 
-# Create your tests here.
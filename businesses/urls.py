@@ -1,8 +1,14 @@
-from django.urls import path
-from . import views
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from . import api, views
 
 app_name = 'businesses'
 
+router = DefaultRouter()
+router.register('businesses', api.BusinessViewSet, basename='api-business')
+router.register('review-links', api.ReviewLinkViewSet, basename='api-review-link')
+router.register('reviews', api.CustomerReviewViewSet, basename='api-review')
+
 urlpatterns = [
     # FBV routes (old)
     path('', views.landing_page, name='landing_page'),
@@ -13,6 +19,8 @@ urlpatterns = [
 
     path('create/', views.create_business, name='create_business'),
     path('business/<int:id>/', views.business_detail, name='business_detail'),
+    path('business/<int:id>/stats/', views.business_stats, name='business_stats'),
+    path('business/<int:id>/reviews/', views.business_reviews, name='business_reviews'),
     path('delete/<int:id>/', views.delete_business, name='delete_business'),
 
     path('settings/', views.settings_view, name='settings'),
@@ -20,4 +28,10 @@ urlpatterns = [
     ## QR code
     path('qr_code/<uuid:token>/', views.qr_code, name='qr_code'),
     path('create-qrcode/<str:token>/', views.create_qr_code_page, name='create_qr_code'),
+
+    ## Prometheus metrics
+    path('metrics', views.metrics, name='metrics'),
+
+    ## REST API (read-only, for integrations)
+    path('api/', include(router.urls)),
 ]
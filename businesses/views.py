@@ -1,16 +1,21 @@
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from businesses.models import Business, ReviewLink
 from django.conf import settings
-import qrcode
-from io import BytesIO
+from django.utils.cache import get_conditional_response
 from django.contrib.auth.decorators import login_required
 from .forms import BusinessForm
 from django.contrib.auth import get_user_model
 User = get_user_model()
 from django.urls import reverse
-from businesses.tasks import update_google_stats_for_one_business
-from businesses.services import fetch_google_stats_for_place
+from businesses.tasks import queue_google_stats_refresh
+from businesses.rollups import summarize_daily_stats
+from businesses.pagination import paginate_reviews
+from businesses.metrics import render_metrics
+from django.utils.crypto import constant_time_compare
+from businesses.qr import (
+    DEFAULT_BOX_SIZE, MAX_BOX_SIZE, QR_CONTENT_TYPES, qr_code_url, qr_etag, render_qr_code, warm_qr_cache,
+)
 
 def landing_page(request):
     if request.user.is_authenticated:
@@ -19,28 +24,36 @@ def landing_page(request):
 
 @login_required # only authenticated users can reach this function
 def dashboard(request):
-    businesses = Business.objects.filter(owner=request.user)
+    # Each card links to its review form and QR page, so fetch the links in the same query
+    businesses = Business.objects.filter(owner=request.user).select_related('review_link')
     
     context = {'businesses': businesses,}
     return render(request, 'businesses/dashboard.html', context)
 
 @login_required
 def analytics(request):
-    businesses = Business.objects.filter(owner=request.user)
+    businesses = list(
+        Business.objects.filter(owner=request.user).only('id', 'name', 'rating', 'total_reviews')
+    )
     selected_id = request.GET.get('business')
     selected_business = None
 
-    # Only get a business if an ID was provided
+    # Only get a business if an ID was provided (picked from the list, no extra query)
     if selected_id:
         try:
-            selected_business = businesses.get(id=int(selected_id))
-        except (Business.DoesNotExist, ValueError):
-            selected_business = None
+            selected_pk = int(selected_id)
+        except ValueError:
+            selected_pk = None
+        selected_business = next((b for b in businesses if b.pk == selected_pk), None)
+
+    # Our own review/click numbers come from the daily rollups: O(days), not O(reviews)
+    activity = summarize_daily_stats(selected_business) if selected_business else None
 
     context = {
         'businesses': businesses,
         'selected_business': selected_business,
         'selected_id': selected_id,
+        'activity': activity,
     }
     return render(request, 'businesses/analytics.html', context)
 
@@ -61,17 +74,11 @@ def create_business(request):
             business = form.save(commit=False)
             business.owner = request.user
             business.save()
-            business.get_review_link()
-
-            # 1. Sync fetch so the dashboard shows numbers immediately
-            rating, count = fetch_google_stats_for_place(business.place_id)
-            if (rating is not None) or (count is not None):
-                business.rating = rating
-                business.total_reviews = count
-                business.save(update_fields=["rating", "total_reviews"])
-            else:
-                # 2. Fallback: queue a background refresh just for this business
-                update_google_stats_for_one_business.delay(business.id) # type: ignore
+            review_link = business.get_review_link()
+            warm_qr_cache(request.build_absolute_uri(review_link.get_absolute_url()))
+
+            # Stats show as pending; the dashboard polls business_stats until they land
+            queue_google_stats_refresh(business.id)
 
             return redirect('businesses:dashboard')
 
@@ -98,6 +105,9 @@ def business_detail(request, id):
         form = BusinessForm(request.POST, instance=business)
         if form.is_valid():
             form.save()
+            if 'name' in form.changed_data:
+                # Pre-generated reviews mention the old name
+                business.pregenerated_reviews.all().delete()
             return redirect("businesses:dashboard")
     else:
         form = BusinessForm(instance=business)
@@ -109,6 +119,36 @@ def business_detail(request, id):
     
     return render(request, 'businesses/business_detail.html', context)
     
+@login_required
+def business_reviews(request, id):
+    """Customer reviews for one business, newest first, paged with a keyset cursor."""
+    business = get_object_or_404(Business.objects.only('id', 'name', 'owner_id'), id=id, owner=request.user)
+    try:
+        reviews, next_cursor = paginate_reviews(business.reviews.all(), request.GET.get('cursor'))
+    except ValueError:
+        raise Http404("Invalid page cursor")
+
+    context = {
+        'business': business,
+        'reviews': reviews,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+    }
+    return render(request, 'businesses/business_reviews.html', context)
+
+@login_required
+def business_stats(request, id):
+    """Lightweight JSON the dashboard polls while Google stats are pending."""
+    business = get_object_or_404(
+        Business.objects.only('id', 'place_id', 'rating', 'total_reviews', 'stats_updated_at', 'stats_failed_at'),
+        id=id, owner=request.user,
+    )
+    return JsonResponse({
+        'rating': business.rating,
+        'total_reviews': business.total_reviews,
+        'pending': business.stats_pending,
+    })
+    
 @login_required
 def delete_business(request, id):
     if request.method == 'POST':
@@ -124,7 +164,8 @@ def create_qr_code_page(request, token):
 
     context = {
         'business': business,
-        'review_link': review_link, }
+        'review_link': review_link,
+        'qr_code_url': qr_code_url(review_link), }
     
     return render(request, 'businesses/create_qrcode.html', context)
 
@@ -132,17 +173,25 @@ def qr_code(request, token):
     review_link = get_object_or_404(ReviewLink, token=token)
     review_url = request.build_absolute_uri(review_link.get_absolute_url())
 
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(review_url)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white") 
+    fmt = request.GET.get('format', 'png')
+    if fmt not in QR_CONTENT_TYPES:
+        return HttpResponseBadRequest("Unsupported QR code format")
+    try:
+        box_size = int(request.GET.get('size', DEFAULT_BOX_SIZE))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid QR code size")
+    box_size = max(1, min(box_size, MAX_BOX_SIZE))
 
-    buffer = BytesIO()
-    img.save(buffer, "PNG")
-    buffer.seek(0)
+    # The image only depends on the URL, format and size, so browsers and
+    # CDNs can keep it for a long time and revalidate with the ETag
+    etag = qr_etag(review_url, fmt, box_size)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(render_qr_code(review_url, fmt, box_size), content_type=QR_CONTENT_TYPES[fmt])
 
-    return HttpResponse(buffer.getvalue(), content_type="image/png")
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 
 from django.contrib import messages
@@ -187,4 +236,19 @@ def settings_view(request):
         'password_form': password_form,
         'has_password': has_password,
     }
-    return render(request, 'businesses/settings.html', context)
\ No newline at end of file
+    return render(request, 'businesses/settings.html', context)
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint. Requires "Authorization: Bearer <METRICS_TOKEN>";
+    with no token configured it only answers when DEBUG is on.
+    """
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not constant_time_compare(supplied, settings.METRICS_TOKEN):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        raise Http404
+
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
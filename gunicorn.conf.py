@@ -0,0 +1,26 @@
+"""
+Gunicorn settings, read automatically from the working directory.
+
+Sets up prometheus_client's multiprocess mode so /metrics adds up every
+worker, not just the one that answers the scrape.
+"""
+import os
+import shutil
+
+# prometheus_client picks its storage when first imported, and workers are
+# forked from this process, so this must come before importing it
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/reviewbud-metrics')
+
+from prometheus_client import multiprocess  # noqa: E402
+
+
+def on_starting(server):
+    # Start every deploy from zero; files left by a previous master would be summed in
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges; its counters and histograms stay in the totals
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,5 +1,5 @@
 """
-ASGI config for quickrate project.
+ASGI config for reviewbud project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
@@ -11,6 +11,32 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quickrate.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reviewbud.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from businesses.ai_service import awarm_up_openai_client  # noqa: E402
+from businesses.backends import warm_up_local_backend  # noqa: E402
+from businesses.tasks import start_schedule_without_broker  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """
+    Django's ASGI app plus lifespan handling, so each worker opens its
+    pooled OpenAI connection and trains its local review backend at boot
+    instead of on the first review. Without a Celery broker it also starts
+    the periodic tasks (see businesses.tasks.start_schedule_without_broker).
+    """
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            warm_up_local_backend()
+            start_schedule_without_broker()
+            await awarm_up_openai_client()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
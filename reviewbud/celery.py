@@ -0,0 +1,19 @@
+"""
+Celery application for reviewbud.
+
+Run a worker with beat for the periodic Places refresh and pool top-ups
+(the Procfile's `worker` process; deploy it next to `web`):
+    celery -A reviewbud worker --beat -l info
+
+Without CELERY_BROKER_URL the web workers run tasks and the schedule
+themselves; see businesses.tasks.start_schedule_without_broker.
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reviewbud.settings')
+
+app = Celery('reviewbud')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -14,6 +14,9 @@ if not SECRET_KEY:
 
 DEBUG = os.environ.get('DEBUG', 'False') == 'True'
 
+# Public URL used when building absolute links outside a request
+SITE_URL = os.environ.get('SITE_URL', 'https://reviewbud.co')
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -29,9 +32,74 @@ GOOGLE_PLACES_API_KEY = os.environ.get('GOOGLE_PLACES_API_KEY')
 GOOGLE_PLACES_SERVER_API_KEY = os.environ.get('GOOGLE_PLACES_SERVER_API_KEY')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 USE_OPENAI_API = os.environ.get('USE_OPENAI_API', 'False') == 'True'
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL') or None
 OAUTH_GOOGLE_CLIENT_ID = os.environ.get('OAUTH_GOOGLE_CLIENT_ID')
 OAUTH_GOOGLE_SECRET = os.environ.get('OAUTH_GOOGLE_SECRET')
 
+# OPENAI CLIENT POOL (one shared client per worker process)
+OPENAI_TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT', 30))
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get('OPENAI_CONNECT_TIMEOUT', 5))
+OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', 2))
+OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', 100))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 20))
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY', 60))
+OPENAI_WARMUP = os.environ.get('OPENAI_WARMUP', 'True') == 'True'  # connect at worker boot
+
+# OPENAI CIRCUIT BREAKER AND LATENCY BUDGET (see businesses/circuit_breaker.py)
+OPENAI_LATENCY_BUDGET = float(os.environ.get('OPENAI_LATENCY_BUDGET', 8))  # seconds a customer waits before the fallback
+OPENAI_BREAKER_FAILURE_RATE = float(os.environ.get('OPENAI_BREAKER_FAILURE_RATE', 0.5))
+OPENAI_BREAKER_WINDOW = int(os.environ.get('OPENAI_BREAKER_WINDOW', 20))  # recent calls considered
+OPENAI_BREAKER_MIN_CALLS = int(os.environ.get('OPENAI_BREAKER_MIN_CALLS', 5))
+OPENAI_BREAKER_SLOW_CALL = float(os.environ.get('OPENAI_BREAKER_SLOW_CALL', 5))  # seconds, slower counts as a failure
+OPENAI_BREAKER_OPEN_SECONDS = float(os.environ.get('OPENAI_BREAKER_OPEN_SECONDS', 30))
+
+# LOCAL REVIEW BACKEND (see businesses/backends.py)
+REVIEW_LOCAL_BACKEND = os.environ.get('REVIEW_LOCAL_BACKEND', 'template')  # used when OpenAI fails; 'ngram' needs businesses/data/restaurant_reviews.json
+
+# REVIEW SUBMISSION RATE LIMITS (see reviews/ratelimit.py; businesses can add an IP limit and override the link's)
+# Per IP across all links. Set above the link limit: a venue's diners share its Wi-Fi address
+REVIEW_RATE_LIMIT_PER_IP = int(os.environ.get('REVIEW_RATE_LIMIT_PER_IP', 120))  # per minute, 0 disables
+REVIEW_RATE_LIMIT_PER_LINK = int(os.environ.get('REVIEW_RATE_LIMIT_PER_LINK', 60))  # per minute, 0 disables
+NUM_PROXIES = int(os.environ.get('NUM_PROXIES', 1))  # reverse proxies adding X-Forwarded-For (Railway: 1), 0 if none
+
+# REVIEW DRAFTS
+REVIEW_DRAFTS = int(os.environ.get('REVIEW_DRAFTS', 1))  # alternatives per live generation; each one adds output tokens and cost
+REVIEW_DRAFT_CHOICE_TTL = int(os.environ.get('REVIEW_DRAFT_CHOICE_TTL', 60 * 60))  # seconds a customer can record the draft they posted
+
+# REVIEW LINK CLICK COUNTING (buffered in the shared cache, see businesses/clicks.py)
+CLICK_BUFFERED = bool(os.environ.get('REDIS_URL'))  # without a shared cache every click is written straight away
+CLICK_FLUSH_INTERVAL = float(os.environ.get('CLICK_FLUSH_INTERVAL', 10))  # seconds
+CLICK_FLUSH_THRESHOLD = int(os.environ.get('CLICK_FLUSH_THRESHOLD', 100))  # clicks
+
+# REVIEW SUBMISSION IDEMPOTENCY (see reviews/idempotency.py)
+REVIEW_IDEMPOTENCY_TTL = int(os.environ.get('REVIEW_IDEMPOTENCY_TTL', 10 * 60))  # seconds a result is replayed
+REVIEW_GENERATION_LOCK_TIMEOUT = int(os.environ.get('REVIEW_GENERATION_LOCK_TIMEOUT', 90))  # longest generation
+
+# PRE-GENERATED REVIEW POOL (see businesses/review_pool.py)
+REVIEW_POOL_DEPTH = int(os.environ.get('REVIEW_POOL_DEPTH', 3))  # drafts per business and rating, 0 disables
+REVIEW_POOL_MAX_AGE = int(os.environ.get('REVIEW_POOL_MAX_AGE', 7 * 24 * 60 * 60))  # seconds
+REVIEW_POOL_ACTIVE_DAYS = int(os.environ.get('REVIEW_POOL_ACTIVE_DAYS', 30))  # only stock recently used ratings
+REVIEW_POOL_INTERVAL = float(os.environ.get('REVIEW_POOL_INTERVAL', 60 * 60))  # seconds between sweeps
+REVIEW_POOL_TOP_UP_TIMEOUT = int(os.environ.get('REVIEW_POOL_TOP_UP_TIMEOUT', 5 * 60))  # one queued refill per pool
+
+# METRICS (Prometheus text at /metrics; gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # scrapers send "Authorization: Bearer <token>"
+
+# GOOGLE PLACES API CLIENT
+PLACES_CONNECT_TIMEOUT = float(os.environ.get('PLACES_CONNECT_TIMEOUT', 3))
+PLACES_READ_TIMEOUT = float(os.environ.get('PLACES_READ_TIMEOUT', 6))
+PLACES_MAX_RETRIES = int(os.environ.get('PLACES_MAX_RETRIES', 2))
+PLACES_RETRY_BACKOFF = float(os.environ.get('PLACES_RETRY_BACKOFF', 0.5))  # seconds, doubled per retry
+PLACES_POOL_SIZE = int(os.environ.get('PLACES_POOL_SIZE', 10))
+PLACES_STATS_CACHE_TTL = int(os.environ.get('PLACES_STATS_CACHE_TTL', 10 * 60))  # seconds
+
+# GOOGLE PLACES STATS REFRESH
+PLACES_QPS = float(os.environ.get('PLACES_QPS', 5))  # request budget shared by the sweep
+PLACES_REFRESH_CONCURRENCY = int(os.environ.get('PLACES_REFRESH_CONCURRENCY', 4))
+PLACES_REFRESH_CHUNK_SIZE = int(os.environ.get('PLACES_REFRESH_CHUNK_SIZE', 100))
+PLACES_REFRESH_ATTEMPTS = int(os.environ.get('PLACES_REFRESH_ATTEMPTS', 3))  # per business per sweep
+PLACES_REFRESH_INTERVAL = float(os.environ.get('PLACES_REFRESH_INTERVAL', 6 * 60 * 60))  # seconds
+
 # APPLICATION DEFINITION
 INSTALLED_APPS = [
     # Django built-in
@@ -59,6 +127,7 @@ INSTALLED_APPS = [
 
 # MIDDLEWARE
 MIDDLEWARE = [
+    'businesses.metrics.RequestMetricsMiddleware',  # first, so it times the whole stack
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -82,7 +151,9 @@ if USE_POSTGRES:
     DATABASES = {
         'default': dj_database_url.config(
             default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600,
+            # Under ASGI every request runs its ORM calls in its own thread, so
+            # persistent connections would pile up one per thread. Keep 0 there.
+            conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 0)),
             conn_health_checks=True,
         )
     }
@@ -165,6 +236,33 @@ REST_FRAMEWORK = {
     ],
 }
 
+# CACHE (Redis when REDIS_URL is set, so rate limits and idempotency keys are
+# shared by every worker; otherwise Django's per-process default)
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# CELERY
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', '')
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL  # no broker: tasks and the beat schedule run in the web workers
+BACKGROUND_TASK_THREADS = int(os.environ.get('BACKGROUND_TASK_THREADS', 4))  # per web worker, without a broker
+CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    'refresh-google-stats': {
+        'task': 'businesses.tasks.refresh_google_stats',
+        'schedule': PLACES_REFRESH_INTERVAL,
+    },
+    'top-up-review-pools': {
+        'task': 'businesses.tasks.top_up_review_pools',
+        'schedule': REVIEW_POOL_INTERVAL,
+    },
+}
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Only allow all in development
 
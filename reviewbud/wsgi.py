@@ -1,5 +1,5 @@
 """
-WSGI config for quickrate project.
+WSGI config for reviewbud project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reviewbud.settings')
 
 application = get_wsgi_application()
+
+# Open the shared OpenAI connection and train the local backend now rather than on the first review
+from businesses.ai_service import warm_up_openai_client  # noqa: E402
+from businesses.backends import warm_up_local_backend  # noqa: E402
+from businesses.tasks import start_schedule_without_broker  # noqa: E402
+warm_up_openai_client()
+warm_up_local_backend()
+start_schedule_without_broker()  # periodic tasks, when there is no Celery broker
@@ -0,0 +1,169 @@
+"""
+Idempotent review submissions.
+
+The review form sends a fresh idempotency key with every logical
+submission. Requests repeating a key (double taps, browser retries, a
+flaky mobile connection resending the POST) share a single generation:
+
+- while it runs, duplicates in this process await the same future and
+  duplicates in other processes wait on a cache lock;
+- once it has finished, its result is kept in the cache for
+  REVIEW_IDEMPOTENCY_TTL seconds and replayed.
+
+So each key costs one OpenAI call and one CustomerReview row.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+POLL_INTERVAL = 0.2  # seconds between cache checks while another process generates
+
+_ABANDONED = object()  # the generating request went away before finishing
+_inflight = {}  # cache key -> Future resolved by the request generating in this process
+
+
+def submission_key(request, token, payload):
+    """
+    Cache key for the request's idempotency key, scoped to the review link
+    and bound to what was submitted: a key reused with different ratings,
+    feedback or tags is a new submission, not a replay of the old review.
+
+    Args:
+        payload: the parsed submission, anything JSON-serializable
+
+    Returns:
+        str, or None when the client sent no usable key
+    """
+    key = request.POST.get('idempotency_key') or request.headers.get('Idempotency-Key', '')
+    if not KEY_RE.match(key):
+        return None
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+    return f"reviews:submit:{token}:{key}:{digest}"
+
+
+class Generation:
+    """
+    Handed to the one request that generates for a key. It must end with
+    exactly one of finish(), fail() or abandon().
+    """
+
+    def __init__(self, key, future):
+        self.key = key
+        self.future = future
+        self.settled = False
+
+    def _settle(self, result=None, error=None):
+        if self.settled:
+            return
+        self.settled = True
+        _inflight.pop(self.key, None)
+        if error is not None:
+            self.future.set_exception(error)
+            self.future.exception()  # don't warn when no duplicate was waiting
+        else:
+            self.future.set_result(result)
+
+    async def finish(self, result):
+        """Hand `result` to the waiting duplicates and keep it for replays."""
+        self._settle(result=result)
+        await cache.aset(self.key, result, settings.REVIEW_IDEMPOTENCY_TTL)
+        await cache.adelete(f"{self.key}:lock")
+
+    async def fail(self, error):
+        """Duplicates waiting in this process get the same error."""
+        self._settle(error=error)
+        await cache.adelete(f"{self.key}:lock")
+
+    async def abandon(self):
+        """The client went away mid-generation: let a waiting duplicate take over."""
+        self._settle(result=_ABANDONED)
+        await cache.adelete(f"{self.key}:lock")
+
+
+async def _claim_or_wait(key):
+    """
+    Returns:
+        the finished result, or None once this process holds the key's lock
+    """
+    lock = f"{key}:lock"
+    while True:
+        result = await cache.aget(key)
+        if result is not None:
+            return result
+        if await cache.aadd(lock, True, settings.REVIEW_GENERATION_LOCK_TIMEOUT):
+            result = await cache.aget(key)  # finished between the two checks
+            if result is not None:
+                await cache.adelete(lock)
+            return result
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def begin(key):
+    """
+    Start, join or replay the submission for `key`.
+
+    Returns:
+        (result, None): a request with this key already finished (possibly
+            after waiting for it here); replay its result
+        (None, generation): this request generates; end with generation.finish()
+
+    Raises:
+        whatever the generating request failed with, when waiting on it
+    """
+    while True:
+        pending = _inflight.get(key)
+        if pending is None:
+            break
+        result = await asyncio.shield(pending)
+        if result is not _ABANDONED:
+            logger.info(f"Coalesced duplicate submission {key}")
+            return result, None
+
+    # Registered before the first await so concurrent duplicates find it
+    generation = Generation(key, asyncio.get_running_loop().create_future())
+    _inflight[key] = generation.future
+    try:
+        result = await _claim_or_wait(key)
+    except BaseException:
+        generation._settle(result=_ABANDONED)
+        raise
+
+    if result is not None:
+        logger.info(f"Replayed submission {key}")
+        generation._settle(result=result)
+        return result, None
+    return None, generation
+
+
+async def run_once(key, generate):
+    """
+    Await `generate()` at most once per key and return its result to every caller.
+
+    The generation runs in its own task, so a client disconnecting doesn't
+    throw away an OpenAI call that a retry is about to ask for again.
+    """
+    result, generation = await begin(key)
+    if generation is None:
+        return result
+
+    async def run():
+        try:
+            result = await generate()
+        except asyncio.CancelledError:
+            await generation.abandon()
+            raise
+        except Exception as e:
+            await generation.fail(e)
+            raise
+        await generation.finish(result)
+        return result
+
+    return await asyncio.shield(asyncio.ensure_future(run()))
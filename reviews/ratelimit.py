@@ -0,0 +1,116 @@
+"""
+Token-bucket rate limits on review submissions.
+
+Every new submission (plain or streamed) takes a token from the buckets
+kept in the shared cache for it:
+
+- the client's IP, site-wide, so cycling through review links doesn't
+  buy a script more submissions (REVIEW_RATE_LIMIT_PER_IP). Diners on a
+  venue's Wi-Fi or a carrier NAT share one address, so this defaults
+  well above the link limit and the link's bucket is what paces them;
+- the client's IP on this review link, only if the business set a
+  stricter ip_rate_limit of its own;
+- the review link (link_rate_limit, or REVIEW_RATE_LIMIT_PER_LINK).
+
+A bucket holds one minute's worth of submissions and refills
+continuously, so a customer can retry a few times in a row but a script
+can't keep a worker and an OpenAI call busy for every request it sends.
+When a bucket is empty the view answers 429 right away, with Retry-After
+saying when the next token arrives. Limits are per minute; 0 turns one
+off. Retries of an idempotent submission (reviews/idempotency.py) replay
+or join the first one and aren't charged again.
+
+Buckets are read and written without a lock, so simultaneous requests
+can share the last token and overshoot by a request or two. That's fine
+for shedding abuse, and keeps the check at a few cache round trips.
+"""
+import ipaddress
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def client_ip(request):
+    """
+    The address the request came from. Behind NUM_PROXIES reverse proxies
+    (Railway's edge is one) that's the NUM_PROXIES-th address from the
+    right of X-Forwarded-For; anything left of it was sent by the client
+    and can't be trusted.
+
+    Returns:
+        str, or None when there is no valid address
+    """
+    candidate = request.META.get('REMOTE_ADDR')
+    if settings.NUM_PROXIES:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= settings.NUM_PROXIES:
+            candidate = forwarded[-settings.NUM_PROXIES]
+    try:
+        return str(ipaddress.ip_address(candidate))
+    except ValueError:
+        return None
+
+
+class RateLimited(Exception):
+    """The submission is over a rate limit; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__('Too many reviews submitted, please try again shortly')
+        self.retry_after = retry_after
+
+
+def submission_buckets(review_link, ip):
+    """
+    Returns:
+        list: (cache key, submissions per minute) of each bucket a submission takes a token from
+    """
+    business = review_link.business
+    per_link = business.link_rate_limit
+    buckets = []
+    if ip:
+        # One client over its limit mustn't use up the link's bucket, so IPs go first
+        buckets += [
+            (f"reviews:rate:ip:{ip}", settings.REVIEW_RATE_LIMIT_PER_IP),
+            (f"reviews:rate:ip:{review_link.token}:{ip}", business.ip_rate_limit or 0),
+        ]
+    buckets.append((
+        f"reviews:rate:link:{review_link.token}",
+        settings.REVIEW_RATE_LIMIT_PER_LINK if per_link is None else per_link,
+    ))
+    return [(key, per_minute) for key, per_minute in buckets if per_minute]
+
+
+async def atake_token(key, per_minute, now=None):
+    """
+    Take one token from the bucket at `key`, which refills at `per_minute`
+    tokens a minute up to `per_minute` tokens.
+
+    Returns:
+        float: 0 if a token was taken, else seconds until one is available
+    """
+    now = time.time() if now is None else now  # wall clock, shared by every worker
+    rate = per_minute / 60
+    tokens, updated = await cache.aget(key) or (per_minute, now)
+    tokens = min(per_minute, tokens + (now - updated) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    # Kept until it would have refilled anyway
+    await cache.aset(key, (tokens - 1, now), timeout=61)
+    return 0
+
+
+async def acheck_submission(review_link, ip):
+    """
+    Take a token for this submission from each of its buckets, stopping at
+    the first empty one.
+
+    Returns:
+        int: 0 if the submission may go ahead, else the Retry-After in seconds
+    """
+    for key, per_minute in submission_buckets(review_link, ip):
+        wait = await atake_token(key, per_minute)
+        if wait:
+            return math.ceil(wait)
+    return 0
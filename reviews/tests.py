@@ -1,3 +1,337 @@
-from django.test import TestCase
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from businesses.models import Business, CustomerReview, PregeneratedReview
+from reviews.ratelimit import atake_token, client_ip
+from users.models import User
+
+
+MISSING_TOKEN = '00000000-0000-4000-8000-000000000000'
+
+
+def parse_events(body):
+    """(event, data) pairs of a server-sent event stream."""
+    events = []
+    for raw in body.strip().split('\n\n'):
+        event, data = raw.split('\n')
+        events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+
+@override_settings(REVIEW_POOL_DEPTH=0)
+class ReviewViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create(username='owner')
+        self.business = Business.objects.create(owner=owner, name='Cafe', google_review_url='https://g.co/r')
+        self.link = self.business.get_review_link()
+
+    async def fake_stream(self, **kwargs):
+        for text in ("Solid ", "spot"):
+            yield "token", text
+        yield "drafts", ["Solid spot.", "Good food."]
+        yield "done", ("Solid spot.", "ChatGPT API", 4)
+
+    def url(self, view, token=None):
+        return reverse(f'reviews:{view}', kwargs={'token': token or self.link.token})
+
+    async def stream(self, data=None):
+        response = await self.async_client.post(self.url('stream_review'), data or {'feedback': 'Great coffee'})
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        return response, parse_events(body)
+
+    async def test_stream_sends_tokens_then_the_saved_review(self):
+        with mock.patch('reviews.views.astream_review_with_ai', self.fake_stream):
+            response, events = await self.stream()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual([event for event, _ in events], ['token', 'token', 'done'])
+        self.assertEqual(''.join(data['text'] for _, data in events[:2]), 'Solid spot')
+        done = events[-1][1]
+        self.assertEqual(done['ai_review'], 'Solid spot.')
+        self.assertEqual(done['drafts'], ['Solid spot.', 'Good food.'])
+        self.assertEqual(done['google_url'], 'https://g.co/r')
+        review = await CustomerReview.objects.aget()
+        self.assertEqual((review.ai_review, review.rating), ('Solid spot.', 4))
+
+    async def test_stream_failure_is_an_error_event_and_saves_nothing(self):
+        with mock.patch('reviews.views.astream_review_with_ai', self.fake_stream), \
+                mock.patch('reviews.views.save_review', side_effect=RuntimeError('database is locked')):
+            _, events = await self.stream()
+
+        self.assertEqual([event for event, _ in events], ['token', 'token', 'error'])
+        self.assertEqual(events[-1][1], {'success': False, 'error': 'database is locked'})
+        self.assertFalse(await CustomerReview.objects.aexists())
+
+    async def test_submit_returns_the_review(self):
+        generate = mock.AsyncMock(return_value=(["Solid spot.", "Good food."], "ChatGPT API", 4))
+        with mock.patch('reviews.views.agenerate_review_drafts', generate):
+            response = await self.async_client.post(self.url('submit_review'), {'food_rating': 4, 'feedback': 'Great'})
+
+        self.assertEqual(response.json()['drafts'], ["Solid spot.", "Good food."])
+        self.assertEqual(generate.await_args.kwargs['ratings']['food'], 4)
+        self.assertEqual(await CustomerReview.objects.acount(), 1)
+
+    async def test_the_chosen_draft_replaces_the_saved_one(self):
+        generate = mock.AsyncMock(return_value=(["Solid spot.", "Good food."], "ChatGPT API", 4))
+        with mock.patch('reviews.views.agenerate_review_drafts', generate):
+            result = (await self.async_client.post(self.url('submit_review'), {'feedback': 'Great'})).json()
+
+        other = await Business.objects.acreate(owner=self.business.owner, name='Diner', google_review_url='https://g.co/r')
+        other_link = await sync_to_async(other.get_review_link)()
+        choose = {'review_id': result['review_id'], 'draft': 1}
+        self.assertEqual((await self.async_client.post(self.url('choose_draft', other_link.token), choose)).status_code, 404)
+        self.assertEqual(
+            (await self.async_client.post(self.url('choose_draft'), {**choose, 'draft': 2})).status_code, 404,
+        )
+        self.assertEqual((await self.async_client.post(self.url('choose_draft'), choose)).json(), {'success': True})
+        self.assertEqual((await CustomerReview.objects.aget()).ai_review, "Good food.")
+
+    async def test_bad_ratings_are_a_json_error(self):
+        for view in ('submit_review', 'stream_review'):
+            response = await self.async_client.post(self.url(view), {'food_rating': 'lots'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['success'], False)
+            self.assertIn('invalid literal', response.json()['error'])
+        self.assertFalse(await CustomerReview.objects.aexists())
+
+    async def test_unknown_token(self):
+        # As before the views went async: the form and the stream 404, submit answers in JSON
+        self.assertEqual((await self.async_client.get(self.url('review_form', MISSING_TOKEN))).status_code, 404)
+        self.assertEqual((await self.async_client.post(self.url('stream_review', MISSING_TOKEN))).status_code, 404)
+        response = await self.async_client.post(self.url('submit_review', MISSING_TOKEN))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['success'], False)
+
+    async def test_other_methods_are_a_json_error(self):
+        for view in ('submit_review', 'stream_review'):
+            response = await self.async_client.get(self.url(view))
+            self.assertEqual(response.json(), {'success': False, 'error': 'Invalid request method'})
+
+
+class IdempotentSubmissionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create(username='owner')
+        business = Business.objects.create(owner=owner, name='Cafe', google_review_url='https://g.co/r')
+        self.link = business.get_review_link()
+        self.calls = 0
+
+    async def fake_generate(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)  # long enough for the duplicates to arrive
+        return [f"Review number {self.calls}"], "stub", 5
+
+    async def fake_stream(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        yield "token", "Review "
+        yield "done", (f"Review number {self.calls}", "stub", 5)
+
+    def post(self, view, key, feedback='Great coffee'):
+        url = reverse(f'reviews:{view}', kwargs={'token': self.link.token})
+        return self.async_client.post(url, {'feedback': feedback, 'idempotency_key': key})
+
+    async def test_concurrent_duplicates_generate_once(self):
+        with mock.patch('reviews.views.agenerate_review_drafts', self.fake_generate):
+            responses = await asyncio.gather(*(self.post('submit_review', 'key-aaaaaaaa') for _ in range(5)))
+            replay = await self.post('submit_review', 'key-aaaaaaaa')
+            other = await self.post('submit_review', 'key-bbbbbbbb')
+
+        reviews = {response.json()['ai_review'] for response in responses}
+        self.assertEqual(reviews, {"Review number 1"})
+        self.assertEqual(replay.json()['ai_review'], "Review number 1")
+        self.assertEqual(other.json()['ai_review'], "Review number 2")
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(await CustomerReview.objects.acount(), 2)
+
+    async def test_stream_and_submit_share_a_key(self):
+        with mock.patch('reviews.views.astream_review_with_ai', self.fake_stream), \
+                mock.patch('reviews.views.agenerate_review_drafts', self.fake_generate):
+            stream, duplicate = await asyncio.gather(
+                self.post('stream_review', 'key-cccccccc'),
+                self.post('submit_review', 'key-cccccccc'),
+            )
+            body = b''.join([chunk async for chunk in stream.streaming_content]).decode()
+
+        self.assertIn('event: done', body)
+        self.assertEqual(duplicate.json()['ai_review'], "Review number 1")
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(await CustomerReview.objects.acount(), 1)
+
+    async def test_reused_key_with_a_different_submission_generates_again(self):
+        with mock.patch('reviews.views.agenerate_review_drafts', self.fake_generate):
+            first = await self.post('submit_review', 'key-dddddddd')
+            edited = await self.post('submit_review', 'key-dddddddd', feedback='Great coffee, slow service')
+
+        self.assertEqual(first.json()['ai_review'], "Review number 1")
+        self.assertEqual(edited.json()['ai_review'], "Review number 2")
+        self.assertEqual(
+            await CustomerReview.objects.filter(feedback='Great coffee, slow service').acount(), 1,
+        )
+
+    async def test_without_a_key_every_post_generates(self):
+        with mock.patch('reviews.views.agenerate_review_drafts', self.fake_generate):
+            await asyncio.gather(*(self.post('submit_review', '') for _ in range(2)))
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(await CustomerReview.objects.acount(), 2)
+
+
+@override_settings(OPENAI_API_KEY='sk-test')
+class PregeneratedReviewTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create(username='owner')
+        self.business = Business.objects.create(owner=owner, name='Cafe', google_review_url='https://g.co/r')
+        self.link = self.business.get_review_link()
+        PregeneratedReview.objects.create(business=self.business, rating=4, text="Ready-made review")
+        self.live = mock.AsyncMock(return_value=(["Live review", "Other take"], "ChatGPT API", 4))
+
+    async def submit(self, feedback):
+        url = reverse('reviews:submit_review', kwargs={'token': self.link.token})
+        ratings = {f'{name}_rating': 4 for name in ('food', 'service', 'atmosphere', 'recommend')}
+        with mock.patch('reviews.views.agenerate_review_drafts', self.live), \
+                mock.patch('reviews.views.queue_review_pool_top_up') as top_up:
+            response = await self.async_client.post(url, {**ratings, 'feedback': feedback})
+        return response.json(), top_up
+
+    async def test_minimal_feedback_is_answered_from_the_pool(self):
+        data, top_up = await self.submit('')
+        self.assertEqual(data['ai_review'], "Ready-made review")
+        self.assertEqual(data['drafts'], ["Ready-made review"])
+        self.live.assert_not_called()
+        top_up.assert_called_once_with(self.business.id, 4)
+        self.assertFalse(await PregeneratedReview.objects.aexists())
+        self.assertEqual(await CustomerReview.objects.acount(), 1)
+
+    async def test_substantive_feedback_is_generated_live(self):
+        data, _ = await self.submit('The flat white was perfect and the staff remembered my name')
+        self.assertEqual(data['ai_review'], "Live review")
+        self.assertEqual(data['drafts'], ["Live review", "Other take"])
+        self.assertTrue(await PregeneratedReview.objects.aexists())
+
+
+@override_settings(NUM_PROXIES=1)
+class SharedAddressTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create(username='owner')
+        self.business = Business.objects.create(
+            owner=owner, name='Cafe', google_review_url='https://g.co/r', link_rate_limit=20,
+        )
+        self.link = self.business.get_review_link()
+        self.generate = mock.AsyncMock(return_value=(["A review"], "stub", 5))
+
+    async def test_diners_on_the_venue_wifi_are_paced_by_the_link_limit(self):
+        url = reverse('reviews:submit_review', kwargs={'token': self.link.token})
+        diners = [AsyncClient(headers={'X-Forwarded-For': '203.0.113.7'}) for _ in range(21)]
+        with mock.patch('reviews.views.agenerate_review_drafts', self.generate):
+            statuses = [
+                (await diner.post(url, {'feedback': f'Lovely meal, table {i}'})).status_code
+                for i, diner in enumerate(diners)
+            ]
+        self.assertEqual(statuses, [200] * 20 + [429])
+        self.assertEqual(await CustomerReview.objects.acount(), 20)
+
+
+@override_settings(REVIEW_RATE_LIMIT_PER_IP=2, REVIEW_RATE_LIMIT_PER_LINK=3, NUM_PROXIES=1)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create(username='owner')
+        self.business = Business.objects.create(owner=owner, name='Cafe', google_review_url='https://g.co/r')
+        self.link = self.business.get_review_link()
+        self.generate = mock.AsyncMock(return_value=(["A review"], "stub", 5))
+
+    async def post(self, ip, view='submit_review', link=None, key=''):
+        url = reverse(f'reviews:{view}', kwargs={'token': (link or self.link).token})
+        data = {'feedback': 'Great coffee', 'idempotency_key': key}
+        with mock.patch('reviews.views.agenerate_review_drafts', self.generate):
+            return await self.async_client.post(url, data, headers={'X-Forwarded-For': ip})
+
+    async def test_each_address_gets_its_own_bucket(self):
+        statuses = [(await self.post('203.0.113.7')).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual((await self.post('198.51.100.1')).status_code, 200)
+        self.assertEqual(self.generate.await_count, 3)
+
+    async def test_link_limit_covers_every_address(self):
+        for i in range(3):
+            self.assertEqual((await self.post(f'203.0.113.{i}')).status_code, 200)
+        response = await self.post('203.0.113.99', view='stream_review')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['success'], False)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    async def test_address_limit_is_site_wide(self):
+        other = await Business.objects.acreate(owner=self.business.owner, name='Diner', google_review_url='https://g.co/r')
+        other_link = await sync_to_async(other.get_review_link)()
+        self.assertEqual((await self.post('203.0.113.7')).status_code, 200)
+        self.assertEqual((await self.post('203.0.113.7', link=other_link)).status_code, 200)
+        self.assertEqual((await self.post('203.0.113.7', link=other_link)).status_code, 429)
+
+    async def test_business_can_tighten_the_address_limit_and_lift_the_link_limit(self):
+        self.business.ip_rate_limit = 1
+        await self.business.asave()
+        self.assertEqual([(await self.post('203.0.113.7')).status_code for _ in range(2)], [200, 429])
+
+        self.business.ip_rate_limit = None
+        self.business.link_rate_limit = 0
+        await self.business.asave()
+        statuses = [(await self.post(f'203.0.113.{i}')).status_code for i in range(10, 15)]
+        self.assertEqual(statuses, [200] * 5)
+
+    async def test_retries_of_a_submission_are_not_charged(self):
+        for view in ('submit_review', 'stream_review', 'submit_review'):
+            response = await self.post('203.0.113.7', view=view, key='key-aaaaaaaa')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.generate.await_count, 1)
+
+        await self.post('203.0.113.7', key='key-bbbbbbbb')
+        response = await self.post('203.0.113.7', view='stream_review', key='key-cccccccc')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('event: error', body)
+        self.assertIn('"retry_after": ', body)
+        self.assertEqual(self.generate.await_count, 2)
+
+    async def test_saved_address_comes_from_the_proxy_header(self):
+        await self.post('spoofed, 203.0.113.7')
+        review = await CustomerReview.objects.aget()
+        self.assertEqual(review.ip_address, '203.0.113.7')
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_refills_continuously_up_to_a_minute_of_tokens(self):
+        async def take(now):
+            return await atake_token('bucket', 6, now=now)  # one token every 10 s
+
+        async def run():
+            waits = [await take(1000) for _ in range(7)]
+            return waits, await take(1005), await take(1010), await take(5000)
+
+        waits, early, refilled, after_idle = asyncio.run(run())
+        self.assertEqual(waits[:6], [0] * 6)
+        self.assertAlmostEqual(waits[6], 10)
+        self.assertAlmostEqual(early, 5)
+        self.assertEqual((refilled, after_idle), (0, 0))
+
+    def test_client_ip_trusts_only_the_proxies_entries(self):
+        request = RequestFactory().post('/', HTTP_X_FORWARDED_FOR='1.1.1.1, 203.0.113.7', REMOTE_ADDR='10.0.0.2')
+        with override_settings(NUM_PROXIES=1):
+            self.assertEqual(client_ip(request), '203.0.113.7')
+        with override_settings(NUM_PROXIES=2):
+            self.assertEqual(client_ip(request), '1.1.1.1')
+        with override_settings(NUM_PROXIES=0):
+            self.assertEqual(client_ip(request), '10.0.0.2')
+        with override_settings(NUM_PROXIES=3):  # header shorter than the proxy chain: not from our proxy
+            self.assertEqual(client_ip(request), '10.0.0.2')
 
-# Create your tests here.
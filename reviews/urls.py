@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import ReviewFormView, SubmitReviewView
+from .views import ChooseDraftView, ReviewFormView, SubmitReviewView, StreamReviewView
 
 app_name = 'reviews'
 
 urlpatterns = [
     path('review/<str:token>/', ReviewFormView.as_view(), name='review_form'),
     path('review/<str:token>/submit/', SubmitReviewView.as_view(), name='submit_review'),
-]
\ No newline at end of file
+    path('review/<str:token>/stream/', StreamReviewView.as_view(), name='stream_review'),
+    path('review/<str:token>/draft/', ChooseDraftView.as_view(), name='choose_draft'),
+]
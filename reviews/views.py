@@ -1,75 +1,319 @@
+import json
 import logging
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views import View
-from django.views.generic import TemplateView
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404, render
 
-from businesses.ai_service import generate_review_with_ai
+from businesses.ai_service import agenerate_review_drafts, astream_review_with_ai, average_rating
+from businesses.clicks import record_click
+from businesses.metrics import REVIEW_GENERATIONS, time_stage
+from businesses.review_pool import POOL_METHOD, aclaim_review, pool_enabled, uses_pool
+from businesses.rollups import record_review
+from businesses.tasks import queue_review_pool_top_up
 from businesses.models import ReviewLink, CustomerReview
 from businesses.forms import CustomerReviewForm
+from reviews.idempotency import begin, run_once, submission_key
+from reviews.ratelimit import RateLimited, acheck_submission, client_ip
 
 logger = logging.getLogger(__name__)
 
-class ReviewFormView(TemplateView):
+'''
+These views are async so that a worker is not tied up while waiting on
+OpenAI. Serve them through reviewbud/asgi.py (see Procfile) to get the
+benefit; under WSGI they still work but run one request per worker.
+'''
+
+class ReviewFormView(View):
     template_name = 'reviews/review_form.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        review_link = get_object_or_404(ReviewLink, token=self.kwargs['token'])
-        review_link.increment_clicks()
+    async def get(self, request, token):
+        review_link = await aget_object_or_404(ReviewLink.objects.select_related('business'), token=token)
+        await sync_to_async(record_click)(review_link.pk)
         
-        context.update({
+        context = {
             'business': review_link.business,
             'review_link': review_link,
             'form': CustomerReviewForm(),
-        })
-        return context
+        }
+        return render(request, self.template_name, context)
+
+
+def parse_review_input(request):
+    """Read the ratings, feedback and tags posted by the review form."""
+    ratings = {
+        'food': int(request.POST.get('food_rating', 3)),
+        'service': int(request.POST.get('service_rating', 3)),
+        'atmosphere': int(request.POST.get('atmosphere_rating', 3)),
+        'recommend': int(request.POST.get('recommend_rating', 3)),
+    }
+    feedback = request.POST.get('feedback', '').strip()
+    tags = request.POST.get('tags', '').strip()
+    return ratings, feedback, tags
+
+
+async def pregenerated_review(business, ratings, feedback, tags):
+    """
+    A ready-made review from the pool when the customer gave nothing specific.
+
+    Returns:
+        tuple: (ai_review, generation_method, avg_rating), or None to generate live
+    """
+    if not ratings or not pool_enabled() or not uses_pool(feedback, tags):
+        return None
+
+    avg_rating = average_rating(ratings)
+    ai_review = await aclaim_review(business.id, avg_rating)
+    # Replace the draft just taken, or stock an empty pool for next time
+    await sync_to_async(queue_review_pool_top_up)(business.id, avg_rating)
+
+    if ai_review is None:
+        return None
+    return ai_review, POOL_METHOD, avg_rating
+
+
+async def pregenerated_events(result):
+    """The event stream for a pooled review: just the done event."""
+    yield "done", result
+
+
+def drafts_key(review_id):
+    return f"reviews:drafts:{review_id}"
+
+
+async def review_result(business, review, drafts, generation_method):
+    """
+    The JSON sent back for a generated review. `drafts` are the alternatives
+    the customer can cycle through; the first is saved, and ChooseDraftView
+    swaps in the one they go on to post.
+    """
+    if len(drafts) > 1:
+        await cache.aset(drafts_key(review.pk), drafts, settings.REVIEW_DRAFT_CHOICE_TTL)
+    return {
+        'success': True,
+        'review_id': review.pk,
+        'ai_review': drafts[0],
+        'drafts': drafts,
+        'generation_method': generation_method,
+        'google_url': business.google_review_url,
+    }
+
+
+async def charge_submission(review_link, ip_address):
+    """
+    Take this submission's rate-limit tokens. Called only when a new
+    generation starts, so retries replaying or joining one aren't charged.
+
+    Raises:
+        RateLimited: a bucket is empty
+    """
+    retry_after = await acheck_submission(review_link, ip_address)
+    if retry_after:
+        raise RateLimited(retry_after)
+
+
+def too_many_submissions(error):
+    """429 for a submission over its rate limit, before any generation work."""
+    response = JsonResponse({'success': False, 'error': str(error)}, status=429)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+@sync_to_async
+def create_review(review_link, rating, feedback, ai_review, ip_address):
+    """Insert the review and count it in its daily rollup, both or neither."""
+    with transaction.atomic():
+        review = CustomerReview.objects.create(
+            business=review_link.business,
+            review_link=review_link,
+            rating=rating,
+            feedback=feedback,
+            ai_review=ai_review,
+            ip_address=ip_address,
+        )
+        record_review(review.business_id, rating, review.created_at)
+    return review
+
+
+async def save_review(review_link, rating, feedback, ai_review, generation_method, ip_address):
+    """Store the submitted review and count it in the analytics rollups and metrics."""
+    with time_stage("db_insert"):
+        review = await create_review(review_link, rating, feedback, ai_review, ip_address)
+    REVIEW_GENERATIONS.labels(generation_method).inc()
+    return review
+
 
 class SubmitReviewView(View):
     """
     Collect form input, send it to ai_service, get the generated review back.
     """
 
-    def post(self, request, token):
+    async def post(self, request, token):
         try:
-            review_link = get_object_or_404(ReviewLink, token=token)
+            review_link = await aget_object_or_404(ReviewLink.objects.select_related('business'), token=token)
             business = review_link.business
 
-            ratings = {
-                'food': int(request.POST.get('food_rating', 3)),
-                'service': int(request.POST.get('service_rating', 3)),
-                'atmosphere': int(request.POST.get('atmosphere_rating', 3)),
-                'recommend': int(request.POST.get('recommend_rating', 3)),
-            }
-            feedback = request.POST.get('feedback', '').strip()
-            tags = request.POST.get('tags', '').strip()
-
-            ai_review, generation_method, avg_rating = generate_review_with_ai(
-                ratings=ratings,
-                feedback=feedback,
-                business_name=business.name,
-                tags=tags,
-            )
-
-            CustomerReview.objects.create(
-                business=business,
-                review_link=review_link,
-                rating=avg_rating,
-                feedback=feedback,
-                ai_review=ai_review,
-                ip_address=request.META.get('REMOTE_ADDR'),
-            )
-
-            return JsonResponse({
-                'success': True,
-                'ai_review': ai_review,
-                'generation_method': generation_method,
-                'google_url': business.google_review_url,
-            })
+            ip_address = client_ip(request)
+            ratings, feedback, tags = parse_review_input(request)
+
+            async def submit():
+                await charge_submission(review_link, ip_address)
+
+                pooled = await pregenerated_review(business, ratings, feedback, tags)
+                if pooled:
+                    ai_review, generation_method, avg_rating = pooled
+                    drafts = [ai_review]
+                else:
+                    # Several drafts from one call, so "try another" needs no round-trip
+                    drafts, generation_method, avg_rating = await agenerate_review_drafts(
+                        ratings=ratings,
+                        feedback=feedback,
+                        business_name=business.name,
+                        tags=tags,
+                        count=settings.REVIEW_DRAFTS,
+                    )
+
+                review = await save_review(review_link, avg_rating, feedback, drafts[0], generation_method, ip_address)
+
+                return await review_result(business, review, drafts, generation_method)
 
+            # Retries of the same submission share one generation and one saved review
+            key = submission_key(request, token, [ratings, feedback, tags])
+            return JsonResponse(await run_once(key, submit) if key else await submit())
+
+        except RateLimited as e:
+            return too_many_submissions(e)
         except Exception as e:
             logger.error(f"Error in submit_review: {e}")
             return JsonResponse({'success': False, 'error': str(e)})
 
-    def http_method_not_allowed(self, request, *args, **kwargs):
-        return JsonResponse({'success': False, 'error': 'Invalid request method'})
\ No newline at end of file
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+
+
+def sse_event(event, data):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class StreamReviewView(View):
+    """
+    Same as SubmitReviewView, but streams the review to the browser as
+    server-sent events while GPT-4o is still writing it.
+
+    Events:
+        token: {"text": ...} raw model output of the first draft, appended as it arrives
+        done:  the final humanized review and its alternatives, same payload as SubmitReviewView
+        error: {"error": ...}, with "retry_after" seconds when over a rate limit
+    """
+
+    async def post(self, request, token):
+        review_link = await aget_object_or_404(ReviewLink.objects.select_related('business'), token=token)
+        business = review_link.business
+
+        ip_address = client_ip(request)
+        try:
+            ratings, feedback, tags = parse_review_input(request)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)})
+
+        key = submission_key(request, token, [ratings, feedback, tags])
+        if not key:
+            # Nothing to replay or join, so an over-limit request can still get a plain 429
+            try:
+                await charge_submission(review_link, ip_address)
+            except RateLimited as e:
+                return too_many_submissions(e)
+
+        async def events():
+            generation = None
+            try:
+                if key:
+                    # A duplicate of a submission that is running or done gets its result only
+                    result, generation = await begin(key)
+                    if generation is None:
+                        yield sse_event("done", result)
+                        return
+                    await charge_submission(review_link, ip_address)
+
+                pooled = await pregenerated_review(business, ratings, feedback, tags)
+                review_events = pregenerated_events(pooled) if pooled else astream_review_with_ai(
+                    ratings=ratings,
+                    feedback=feedback,
+                    business_name=business.name,
+                    tags=tags,
+                    count=settings.REVIEW_DRAFTS,
+                )
+
+                drafts = None
+                async for kind, payload in review_events:
+                    if kind == "token":
+                        yield sse_event("token", {'text': payload})
+                        continue
+                    if kind == "drafts":
+                        drafts = payload
+                        continue
+
+                    ai_review, generation_method, avg_rating = payload
+
+                    # Persist only once the stream has completed
+                    review = await save_review(review_link, avg_rating, feedback, ai_review, generation_method, ip_address)
+
+                    result = await review_result(business, review, drafts or [ai_review], generation_method)
+                    if generation:
+                        await generation.finish(result)
+                    yield sse_event("done", result)
+
+            except RateLimited as e:
+                await generation.fail(e)
+                yield sse_event("error", {'success': False, 'error': str(e), 'retry_after': e.retry_after})
+
+            except Exception as e:
+                logger.error(f"Error in stream_review: {e}")
+                if generation:
+                    await generation.fail(e)
+                yield sse_event("error", {'success': False, 'error': str(e)})
+
+            finally:
+                # Client disconnected mid-stream: a retry with the same key starts over
+                if generation and not generation.settled:
+                    await generation.abandon()
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # stop proxies from buffering the stream
+        return response
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+
+
+class ChooseDraftView(View):
+    """
+    Record which draft the customer went on to post. Only drafts generated
+    for the review can be chosen, for as long as they are kept in the cache.
+    """
+
+    async def post(self, request, token):
+        try:
+            review_id = int(request.POST.get('review_id', ''))
+            index = int(request.POST.get('draft', ''))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid draft'}, status=400)
+
+        drafts = await cache.aget(drafts_key(review_id))
+        if not drafts or not 0 <= index < len(drafts):
+            return JsonResponse({'success': False, 'error': 'Unknown draft'}, status=404)
+
+        updated = await CustomerReview.objects.filter(pk=review_id, review_link__token=token).aupdate(
+            ai_review=drafts[index],
+        )
+        if not updated:
+            return JsonResponse({'success': False, 'error': 'Unknown draft'}, status=404)
+        return JsonResponse({'success': True})
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})